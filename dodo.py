@@ -18,3 +18,9 @@ def task_execute():
         'actions': ['python3 src/vebot.py'],
         'clean': True
     }
+
+def task_validate():
+    return {
+        'actions': ['python3 utils/compilebooks.py'],
+        'clean': True
+    }
@@ -23,16 +23,46 @@
 
 """Books cog"""
 
+import io
 import logging
+from collections import Counter
 import discord
 from discord.ext import commands
 
+from lib.books import MonsterBook, Table
+from lib.encounters import roll_encounter
+from lib.odds import OddsError
+from lib.query import Query, QueryError
+from lib.response import Response
+from lib.tablestats import TableStats
+
 
 class BooksCog(commands.Cog):
     """
     This cog is for commands that are related to retrieve info from books.
     """
 
+    # Options follow the order of the command parameters, table rolls can
+    # take a while so their answer is deferred
+    SLASH_COMMANDS = {
+        "monster": {"description": "Searches a monster in the book.",
+                    "options": [{"type": 3, "name": "monster", "required": True,
+                                 "description": "Monster id"}]},
+        "mfind": {"description": "Finds monsters matching a query.",
+                  "options": [{"type": 3, "name": "query", "required": True,
+                               "description": "e.g. HD 3-5, Neutral, XP < 100"}]},
+        "rollt": {"description": "Rolls on a table, optionally several times.",
+                  "defer": True,
+                  "options": [{"type": 3, "name": "table", "required": True,
+                               "description": "Table id"},
+                              {"type": 4, "name": "count", "required": False,
+                               "description": "Number of rolls"}]},
+        "encounter": {"description": "Rolls an encounter with the monsters.",
+                      "defer": True,
+                      "options": [{"type": 3, "name": "table", "required": True,
+                                   "description": "Table id"}]},
+    }
+
     def __init__(self, bot):
         self.bot = bot
 
@@ -80,33 +110,162 @@ class BooksCog(commands.Cog):
         output = monsters.index()
         logging.debug("listed %d monsters", len(output))
 
-        index = sorted(list(output), key=lambda item: item.Name)
-        for cursor in range(0, len(index), 25):
-            embed = discord.Embed(title=f'Monster Book. From {cursor+1} to {cursor+25}')
-            for monster in index[cursor:cursor+25]:
-                embed.add_field(name=monster.Name, value=monster.Id)
-            await ctx.send(embed=embed)
+        response = Response(ctx, title=f'Monster Book. {len(output)} monsters')
+        for monster in sorted(list(output), key=lambda item: item.Name):
+            response.add_field(name=monster.Name, value=monster.Id)
+        await response.send()
+
+    @commands.command(name="mfind", aliases=['mf'])
+    async def mfind(self, ctx, *, expression: str):
+        """Finds monsters matching a query, e.g. "HD 3-5, Neutral, XP < 100"."""
+        try:
+            query = Query(expression)
+        except QueryError as error:
+            await ctx.send(f'wrong query: {error}')
+            return
+
+        library = self.bot.library
+        if query.book == 'all':
+            books = library.monster_books()
+        else:
+            book = library.search(query.book or self.bot.app_settings.monster_book)
+            books = [book] if isinstance(book, MonsterBook) else []
+        if not books:
+            await ctx.send(f'monster manual "{query.book}" not found')
+            return
+
+        monsters, total = query.run([book.columns for book in books])
+        logging.debug("found %d monsters", total)
+        if not monsters:
+            await ctx.send('no monsters found')
+            return
+
+        first = (query.page - 1) * query.PAGE_SIZE + 1
+        embed = discord.Embed(
+            title=f'Monsters {first} to {first + len(monsters) - 1} of {total}')
+        for monster in monsters:
+            embed.add_field(name=monster.Name,
+                            value=f'HD {monster.HD}, XP {monster.XP}, AC {monster.AC}\n'
+                                  f'{monster.Alignment} [{monster.Id}]')
+        await ctx.send(embed=embed)
+
+    MAX_ROLLS = 1000
+    MAX_TALLIES = 20
+    MAX_SIMULATIONS = 1000000
 
     @commands.is_owner()
     @commands.command(name="rollt", aliases=['rt'])
-    async def rollt(self, ctx, table_book: str):
-        """Searches a table and rolls on it."""
+    async def rollt(self, ctx, table_book: str, count: int = 1):
+        """Searches a table and rolls on it, optionally several times."""
         table = self.bot.library.search(table_book)
         if not table:
             await ctx.send(f'table "{table_book}" not found')
             return
 
-        result, explanation = table.roll()
+        if count > 1:
+            await self.rollt_many(ctx, table, min(count, self.MAX_ROLLS))
+            return
+
+        with self.bot.rng.draw(ctx) as seed:
+            result, explanation = table.roll()
         if not result:
             await ctx.send('something went wrong')
             return
+        self.bot.journal.record(ctx, table.bid, seed, result.strip())
 
         embed = discord.Embed(title=table.title) \
             .add_field(name="Result", value=result, inline=False) \
-            .add_field(name="Explanation", value="\n".join(explanation), inline=False)
+            .add_field(name="Explanation", value="\n".join(explanation), inline=False) \
+            .set_footer(text=f'#{seed:x}')
 
         await ctx.send(embed=embed)
 
+    async def rollt_many(self, ctx, table, count: int):
+        """Rolls count times on a table and sends the aggregated results."""
+        with self.bot.rng.draw(ctx) as seed:
+            results = [result.strip() for result in table.roll_many(count)]
+        tallies = Counter(results).most_common()
+        lines = [f'**{hits}x** {result}' for result, hits in tallies]
+        self.bot.journal.record(ctx, f'{count}x {table.bid}', seed, "\n".join(
+            f'{hits}x {result}' for result, hits in tallies))
+
+        title = f'{table.title} ({count} rolls)'
+        summary = "\n".join(lines)
+        if len(tallies) <= self.MAX_TALLIES and len(summary) <= 1024:
+            embed = discord.Embed(title=title) \
+                .add_field(name="Results", value=summary, inline=False) \
+                .set_footer(text=f'#{seed:x}')
+            await ctx.send(embed=embed)
+            return
+
+        tally = [f'{hits}x {result}' for result, hits in tallies]
+        rolls = [f'{cursor}. {result}' for cursor, result in enumerate(results, 1)]
+        report = "\n".join([title, f'#{seed:x}', "", *tally, "", *rolls])
+        handle = io.BytesIO(report.encode('utf-8'))
+        await ctx.send(f'**{title}**: {len(tallies)} different results',
+                       file=discord.File(handle, filename=f'{table.bid}_rolls.txt'))
+
+    @commands.is_owner()
+    @commands.command(name="encounter", aliases=['enc'])
+    async def encounter(self, ctx, table_book: str):
+        """Rolls an encounter with the monsters and their hit points."""
+        table = self.bot.library.search(table_book)
+        if not isinstance(table, Table):
+            await ctx.send(f'table "{table_book}" not found')
+            return
+        monster_book = self.bot.app_settings.monster_book
+        monsters = self.bot.library.search(monster_book)
+        if not monsters:
+            await ctx.send(f'monster manual "{monster_book}" not found')
+            return
+
+        with self.bot.rng.draw(ctx) as seed:
+            groups = roll_encounter(table, monsters)
+        self.bot.journal.record(ctx, table.bid, seed, "\n".join(
+            f'{group.count}x {group.monster.Name}' if group.monster
+            else group.details.strip() for group in groups))
+
+        embed = discord.Embed(title=table.title).set_footer(text=f'#{seed:x}')
+        for group in groups[:25]:
+            if not group.monster:
+                embed.add_field(name="Result", value=group.details.strip() or "-",
+                                inline=False)
+                continue
+            monster = group.monster
+            stats = f'AC {monster.AC}, HD {monster.HD}, Move {monster.Move}\n' \
+                    f'{monster.Attacks} ({monster.Damage}), Morale {monster.Morale}\n' \
+                    f'HP: {", ".join(str(hitpoints) for hitpoints in group.hitpoints)}'
+            embed.add_field(name=f'{group.count}x {monster.Name} [{monster.Id}]',
+                            value=stats[:1024], inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.is_owner()
+    @commands.command(name="tstats", aliases=['ts'])
+    async def tstats(self, ctx, table_book: str, count: int = 0):
+        """Shows how often each entry of a table comes up."""
+        table = self.bot.library.search(table_book)
+        if not isinstance(table, Table):
+            await ctx.send(f'table "{table_book}" not found')
+            return
+
+        count = min(count, self.MAX_SIMULATIONS)
+        try:
+            stats = TableStats(table).exact()
+        except OddsError as err:
+            await ctx.send(f'ERROR: {err}')
+            return
+        if count:
+            await self.bot.loop.run_in_executor(None, stats.simulate, count)
+
+        report = stats.report(count)
+        unreachable = [item.path for item in stats.unreachable]
+        if unreachable:
+            report += ["", f'Unreachable: {", ".join(unreachable)}']
+        handle = io.BytesIO("\n".join(report).encode('utf-8'))
+        await ctx.send(f'**{table.title}**: {len(stats.stats)} entries, '
+                       f'{len(unreachable)} unreachable',
+                       file=discord.File(handle, filename=f'{table.bid}_stats.txt'))
+
 
 def setup(bot):
     """Installs the cog"""
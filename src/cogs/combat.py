@@ -0,0 +1,300 @@
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: disable=too-many-locals
+#
+
+"""Combat tracker cog"""
+
+import logging
+import discord
+from discord.ext import commands
+
+from lib.books import roll_many
+from lib.encounters import monster_index
+
+
+class Combatant():  # pylint: disable=too-few-public-methods
+    """A character or monster in a combat"""
+    __slots__ = ['name', 'mid', 'initiative', 'hitpoints', 'max_hitpoints']
+
+    def __init__(self, name: str, mid: str = None, hitpoints: int = None):
+        self.name = name
+        self.mid = mid
+        self.initiative = 0
+        self.hitpoints = hitpoints
+        self.max_hitpoints = hitpoints
+
+    @property
+    def status(self) -> str:
+        """Returns the line showing the combatant"""
+        line = f'**{self.initiative}** {self.name}'
+        if self.mid:
+            line += f' [{self.mid}]'
+        if self.hitpoints is not None:
+            line += f' HP {self.hitpoints}/{self.max_hitpoints}'
+            if self.hitpoints <= 0:
+                line = f'~~{line}~~'
+        return line
+
+
+class Combat():
+    """The state of the combat going on in a channel"""
+    __slots__ = ['combatants', 'round', 'turn', 'message', 'message_id']
+
+    def __init__(self):
+        self.combatants = []
+        self.round = 1
+        self.turn = 0
+        self.message = None
+        self.message_id = None
+
+    def state(self) -> dict:
+        """Returns the combat as json to resume it after a restart"""
+        return {"round": self.round, "turn": self.turn,
+                "message": self.message.id if self.message else self.message_id,
+                "combatants": [[getattr(combatant, slot) for slot in Combatant.__slots__]
+                               for combatant in self.combatants]}
+
+    @staticmethod
+    def restore(state: dict):
+        """Returns the combat resumed from its json"""
+        combat = Combat()
+        combat.round = state["round"]
+        combat.turn = state["turn"]
+        combat.message_id = state["message"]
+        for values in state["combatants"]:
+            combatant = Combatant(values[0])
+            for slot, value in zip(Combatant.__slots__, values):
+                setattr(combatant, slot, value)
+            combat.combatants.append(combatant)
+        return combat
+
+    def add(self, combatants: list, die: str):
+        """Adds combatants rolling their initiative in one batch"""
+        for combatant, initiative in zip(combatants, roll_many(die, len(combatants))):
+            combatant.initiative = initiative
+        self.combatants += combatants
+        self.sort()
+
+    def reroll(self, die: str):
+        """Rolls the initiative of everyone for a new round"""
+        for combatant, initiative in zip(self.combatants,
+                                         roll_many(die, len(self.combatants))):
+            combatant.initiative = initiative
+        self.sort()
+        self.round += 1
+        self.turn = 0
+
+    def sort(self):
+        """Sorts the combatants by initiative, stable for ties"""
+        self.combatants.sort(key=lambda combatant: -combatant.initiative)
+
+    def find(self, name: str) -> Combatant:
+        """Returns the combatant with that name, or starting with it"""
+        name = name.lower()
+        matches = [combatant for combatant in self.combatants
+                   if combatant.name.lower().startswith(name)]
+        exact = [combatant for combatant in matches if combatant.name.lower() == name]
+        matches = exact or matches
+        return matches[0] if len(matches) == 1 else None
+
+    def count(self, mid: str) -> int:
+        """Returns how many monsters of a kind are in the combat"""
+        return sum(1 for combatant in self.combatants if combatant.mid == mid)
+
+    def next(self):
+        """Moves to the next combatant standing, and the next round after the last"""
+        alive = [combatant for combatant in self.combatants
+                 if combatant.hitpoints is None or combatant.hitpoints > 0]
+        if not alive:
+            return
+        self.turn += 1
+        if self.turn >= len(alive):
+            self.turn = 0
+            self.round += 1
+
+    def embed(self) -> discord.Embed:
+        """Returns the embed with the tracker"""
+        alive = [combatant for combatant in self.combatants
+                 if combatant.hitpoints is None or combatant.hitpoints > 0]
+        current = alive[self.turn % len(alive)] if alive else None
+        lines = [('▶ ' if combatant is current else '') + combatant.status
+                 for combatant in self.combatants]
+        return discord.Embed(title=f'Combat, round {self.round}',
+                             description="\n".join(lines)[:2048] or '-')
+
+
+class CombatCog(commands.Cog):
+    """
+    This cog tracks initiative and hit points of a combat in each channel.
+    """
+    INITIATIVE = "1d6"
+    MAX_MONSTERS = 50
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.combats = {int(channel): Combat.restore(state) for channel, state
+                        in bot.warm_state(self.qualified_name).items()}
+
+    def save_state(self) -> dict:
+        """Returns the combats going on to resume them after a restart"""
+        return {channel: combat.state() for channel, combat in self.combats.items()}
+
+    @staticmethod
+    async def fetch_message(ctx, combat: Combat):
+        """Fetches the tracker message of a combat resumed after a restart"""
+        if combat.message_id:
+            try:
+                combat.message = await ctx.channel.fetch_message(combat.message_id)
+            except discord.HTTPException:
+                pass
+            combat.message_id = None
+
+    async def update(self, ctx, combat: Combat):
+        """Edits the tracker message, posting and pinning it when missing"""
+        await self.fetch_message(ctx, combat)
+        if combat.message:
+            try:
+                await combat.message.edit(embed=combat.embed())
+                return
+            except discord.NotFound:
+                pass
+        combat.message = await ctx.send(embed=combat.embed())
+        try:
+            await combat.message.pin()
+        except (discord.Forbidden, discord.HTTPException) as err:
+            logging.warning('combat tracker not pinned: %s', err)
+
+    def combat(self, ctx) -> Combat:
+        """Returns the combat in the channel, starting one when needed"""
+        combat = self.combats.get(ctx.channel.id)
+        if combat is None:
+            combat = Combat()
+            self.combats[ctx.channel.id] = combat
+        return combat
+
+    @commands.group(name="combat", aliases=['cb'], invoke_without_command=True)
+    async def tracker(self, ctx):
+        """Shows the combat tracker of the channel again."""
+        combat = self.combats.get(ctx.channel.id)
+        if not combat:
+            await ctx.send('no combat in this channel, add combatants with '
+                           f'{ctx.prefix}combat party or {ctx.prefix}combat add')
+            return
+        combat.message = None
+        combat.message_id = None
+        await self.update(ctx, combat)
+
+    @tracker.command(name="party", aliases=['p'])
+    async def party(self, ctx, *names: str):
+        """Adds characters to the combat, rolling their initiative."""
+        if not names:
+            names = [ctx.author.display_name]
+        combat = self.combat(ctx)
+        with self.bot.rng.draw(ctx) as seed:
+            combat.add([Combatant(name) for name in names], self.INITIATIVE)
+        self.bot.journal.record(ctx, f'initiative {" ".join(names)}', seed,
+                                combat.embed().description)
+        await self.update(ctx, combat)
+
+    @tracker.command(name="add", aliases=['a'])
+    async def add(self, ctx, mid: str, count: int = 1):
+        """Adds monsters to the combat, rolling their initiative and hit points."""
+        monster_book = self.bot.app_settings.monster_book
+        monsters = self.bot.library.search(monster_book)
+        if not monsters:
+            await ctx.send(f'monster manual "{monster_book}" not found')
+            return
+        monster = monsters.search(mid) or monster_index(monsters).match(mid)
+        if not monster:
+            await ctx.send(f'"{mid}" not found')
+            return
+        monster = getattr(monster, 'pages', [monster])[0]
+
+        combat = self.combat(ctx)
+        count = max(1, min(count, self.MAX_MONSTERS))
+        first = combat.count(monster.Id) + 1
+        with self.bot.rng.draw(ctx) as seed:
+            hitpoints = monster.roll(count)
+            combat.add([Combatant(f'{monster.Name} {first + number}', monster.Id, points)
+                        for number, points in enumerate(hitpoints)], self.INITIATIVE)
+        self.bot.journal.record(ctx, f'{count}x {monster.Id}', seed,
+                                ", ".join(str(points) for points in hitpoints))
+        await self.update(ctx, combat)
+
+    @tracker.command(name="init", aliases=['i'])
+    async def init(self, ctx):
+        """Rolls initiative for everyone and starts a new round."""
+        combat = self.combats.get(ctx.channel.id)
+        if not combat:
+            await ctx.send('no combat in this channel')
+            return
+        with self.bot.rng.draw(ctx) as seed:
+            combat.reroll(self.INITIATIVE)
+        self.bot.journal.record(ctx, 'initiative', seed, combat.embed().description)
+        await self.update(ctx, combat)
+
+    @tracker.command(name="hp")
+    async def hitpoints(self, ctx, name: str, change: int):
+        """Changes the hit points of a combatant, e.g. hp goblin -4."""
+        combat = self.combats.get(ctx.channel.id)
+        combatant = combat.find(name) if combat else None
+        if not combatant:
+            await ctx.send(f'"{name}" not found in the combat')
+            return
+        if combatant.hitpoints is None:
+            combatant.max_hitpoints = max(change, 0)
+            combatant.hitpoints = max(change, 0)
+        else:
+            combatant.hitpoints += change
+        await self.update(ctx, combat)
+
+    @tracker.command(name="next", aliases=['n'])
+    async def next(self, ctx):
+        """Moves to the next combatant."""
+        combat = self.combats.get(ctx.channel.id)
+        if not combat:
+            await ctx.send('no combat in this channel')
+            return
+        combat.next()
+        await self.update(ctx, combat)
+
+    @tracker.command(name="end")
+    async def end(self, ctx):
+        """Ends the combat in the channel."""
+        combat = self.combats.pop(ctx.channel.id, None)
+        if not combat:
+            await ctx.send('no combat in this channel')
+            return
+        await self.fetch_message(ctx, combat)
+        if combat.message:
+            try:
+                await combat.message.unpin()
+            except (discord.Forbidden, discord.HTTPException) as err:
+                logging.warning('combat tracker not unpinned: %s', err)
+        await ctx.send(f'combat ended after {combat.round} rounds')
+
+
+def setup(bot):
+    """Installs the cog"""
+    bot.add_cog(CombatCog(bot))
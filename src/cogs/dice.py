@@ -25,12 +25,16 @@
 
 """Dice cog"""
 
+import copy
 import logging
+import time
 import rolldice
 import discord
 from discord.enums import ChannelType
 from discord.ext import commands
 
+from lib.odds import OddsError, distribution, histogram
+
 
 def roll_attributes(method: str):
     """roll attributes and provides a score"""
@@ -130,6 +134,16 @@ def check_for_notes(library, attr: str, score: int):  # pylint: disable=unused-a
 class DiceCog(commands.Cog):
     """This cog is for commands that are related rolling die."""
 
+    # Options follow the order of the command parameters
+    SLASH_COMMANDS = {
+        "roll": {"description": "Roll the specified dice or default to d20.",
+                 "options": [{"type": 3, "name": "dice", "required": False,
+                              "description": "Dice expression, e.g. 2d6+1"}]},
+        "odds": {"description": "Shows the exact distribution of the specified dice.",
+                 "options": [{"type": 3, "name": "dice", "required": False,
+                              "description": "Dice expression, e.g. 4d6K3"}]},
+    }
+
     def __init__(self, bot):
         self.bot = bot
 
@@ -138,12 +152,78 @@ class DiceCog(commands.Cog):
         """Roll the specified dice or default to d20."""
         die = arg
         try:
-            result, explanation = rolldice.roll_dice(die)
-            await ctx.send(f'{die} -> **{result}** <- {explanation}')
+            with self.bot.rng.draw(ctx) as seed:
+                result, explanation = rolldice.roll_dice(die)
+            self.bot.journal.record(ctx, die, seed, result)
+            await ctx.send(f'{die} -> **{result}** <- {explanation} `#{seed:x}`')
         except (rolldice.DiceGroupException) as err:
             await ctx.send(f'ERROR: {err}')
             logging.exception(err)
 
+    PERCENTILES = [5, 25, 50, 75, 95]
+
+    @commands.command(name="odds", aliases=['o'])
+    async def odds(self, ctx, *, arg: str = "1d20"):
+        """Shows the exact distribution of the specified dice."""
+        die = arg
+        try:
+            dist = await self.bot.loop.run_in_executor(None, distribution, die)
+        except OddsError as err:
+            await ctx.send(f'ERROR: {err}')
+            return
+
+        percentiles = ", ".join(f'{pct}%: **{dist.percentile(pct / 100)}**'
+                                for pct in self.PERCENTILES)
+        summary = f'mean **{dist.mean():.2f}**, stdev {dist.stdev():.2f}, ' \
+                  f'range {dist.low}-{dist.high}\n{percentiles}'
+        chart = "\n".join(histogram(dist))
+        embed = discord.Embed(title=f'Odds for {die}') \
+            .add_field(name="Summary", value=summary, inline=False) \
+            .add_field(name="Distribution", value=f'```\n{chart}\n```', inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="replay", aliases=['rp'])
+    async def replay(self, ctx, seed: str, *, command: str):
+        """Replays a command with the seed of a previous roll."""
+        try:
+            replay_seed = int(seed.lstrip('#'), 16)
+        except ValueError:
+            await ctx.send(f'invalid seed "{seed}"')
+            return
+
+        message = copy.copy(ctx.message)
+        message.content = f'{ctx.prefix}{command}'
+        replay_ctx = await self.bot.get_context(message)
+        if not replay_ctx.valid:
+            await ctx.send(f'command "{command}" not found')
+            return
+        replay_ctx.replay_seed = replay_seed
+        await self.bot.invoke(replay_ctx)
+
+    MAX_RECAP = 25
+
+    @commands.command(name="recap", aliases=['rcp'])
+    async def recap(self, ctx, hours: float = 4):
+        """Recaps the last rolls in this channel."""
+        since = time.time() - hours * 3600
+        rows = self.bot.journal.recap(ctx.channel.id, since, self.MAX_RECAP)
+        if not rows:
+            await ctx.send(f'no rolls in the last {hours:g} hours')
+            return
+
+        lines = []
+        for stamp, user, command, expression, seed, result in rows:
+            result = result.replace("\n", ", ")
+            lines.append(f'`{time.strftime("%H:%M", time.gmtime(stamp))}` <@{user}> '
+                         f'{command} {expression} -> **{result[:80]}** `#{seed}`')
+        description = "\n".join(lines)
+        while len(description) > 2048:
+            lines.pop(0)
+            description = "\n".join(lines)
+        embed = discord.Embed(title=f'Rolls in the last {hours:g} hours (UTC)',
+                              description=description)
+        await ctx.send(embed=embed)
+
     ATTR_PREFIXES = ['STR', 'DEX', 'CON', 'INT', 'WIS', 'CHA']
 
     @commands.command(name="rollcharacter", aliases=['rc'])
@@ -157,8 +237,11 @@ class DiceCog(commands.Cog):
         attributes = []
         score = 0
         die = ''
-        while score < self.bot.app_settings.score_threshold:
-            attributes, score, die = roll_attributes(method)
+        with self.bot.rng.draw(ctx) as seed:
+            while score < self.bot.app_settings.score_threshold:
+                attributes, score, die = roll_attributes(method)
+        self.bot.journal.record(ctx, f'{method} {name}', seed,
+                                ", ".join(str(row['score']) for row in attributes))
 
         output = []
         system = self.bot.app_settings.system
@@ -180,7 +263,7 @@ class DiceCog(commands.Cog):
         embed = discord.Embed(title='Character') \
             .add_field(name="Ability Scores:", value="\n".join(output), inline=False) \
             .add_field(name="Notes:", value="\n".join(notes)) \
-            .set_footer(text=iam, icon_url=icon)
+            .set_footer(text=f'{iam} #{seed:x}', icon_url=icon)
 
         if self.bot.app_settings.opengame == 'yes':
             await ctx.send(embed=embed)
@@ -23,11 +23,14 @@
 
 """Miscellaneous cog"""
 
+import io
 import logging
 import platform
 import discord
 from discord.ext import commands
 
+from lib.footprint import Footprint
+
 
 class MiscCog(commands.Cog):
     """
@@ -55,6 +58,9 @@ class MiscCog(commands.Cog):
         discord_wrapper_version = discord.__version__
         bot_name = app_info.name
         bot_settings = self.bot.app_settings.details()
+        bot_loop = self.bot.watchdog.details()
+        bot_cogs = "\n".join(f"- **{cog}**: [{seconds * 1000:.1f}ms]"
+                             for cog, seconds in self.bot.cog_load_times.items())
         bot_owner = app_info.owner
         image_url = self.bot.user.avatar_url
 
@@ -66,6 +72,8 @@ class MiscCog(commands.Cog):
         title = f"{bot_name} v{self.bot.version_number}"
         embed = discord.Embed(title=title, color=discord.Color(0x8c9eff)) \
             .add_field(name="Settings", value=bot_settings, inline=False) \
+            .add_field(name="Event loop", value=bot_loop, inline=False) \
+            .add_field(name="Cogs loaded", value=bot_cogs or "-", inline=False) \
             .add_field(name="Developer", value=bot_owner, inline=False) \
             .add_field(name="Source made with",
                        value="\n".join(bot_source_info), inline=False) \
@@ -104,6 +112,17 @@ class MiscCog(commands.Cog):
 
         await ctx.send(embed=embed)
 
+    @commands.is_owner()
+    @commands.command(name="memory", aliases=['mem'])
+    async def memory(self, ctx, top: int = 10):
+        """Reports the memory used by the books of the library."""
+        footprint = await self.bot.loop.run_in_executor(None, Footprint, self.bot.library)
+        report = "\n".join(footprint.report(top))
+        handle = io.BytesIO(report.encode('utf-8'))
+        await ctx.send(f'Library footprint: **{footprint.total / 1024:.1f} KiB** in '
+                       f'{len(footprint.books)} books',
+                       file=discord.File(handle, filename='footprint.txt'))
+
     @commands.is_owner()
     @commands.command(name="delete", aliases=['del'])
     async def delete(self, ctx, number: int = 2):
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Static assets loaded once and served from memory.
+"""
+
+import hashlib
+import logging
+from os import path
+
+
+class StaticAssets():
+    """Static files kept in memory along with their hashes"""
+    __data: dict
+    __hashes: dict
+
+    def __init__(self, assets_path: str, names: list):
+        self.__data = dict()
+        self.__hashes = dict()
+        for name in names:
+            with open(path.join(assets_path, name), 'rb') as handle:
+                data = handle.read()
+            self.__data[name] = data
+            self.__hashes[name] = hashlib.md5(data).hexdigest()
+            logging.info('asset %s loaded (%d bytes)', name, len(data))
+
+    def get(self, name: str) -> bytes:
+        """Returns the contents of an asset"""
+        return self.__data[name]
+
+    def hash(self, name: str) -> str:
+        """Returns the hash of an asset contents"""
+        return self.__hashes[name]
@@ -29,14 +29,32 @@
 Helper classes to manages books.
 """
 
+import copy
 import logging
 import json
 import glob
+import multiprocessing
+import os
+import random
+import re
+import sys
+import sysconfig
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from enum import Enum
 from os import path
 
 import rolldice
 
+from lib.mapped import MappedBooks, book_files, compile_library, is_stale, \
+    mapped_filename
+from lib.query import MonsterColumns
+from lib.store import LibraryStore, leading_number
+
+SIMPLE_DIE = re.compile(r'^\s*(\d*)\s*d\s*(\d+)\s*(?:([+-])\s*(\d+))?\s*$')
+HIT_DICE = re.compile(r'^\s*(\d+)(?:/(\d+))?\s*(hp)?\s*(?:([+-])\s*(\d+))?')
+RANGE_ID = re.compile(r'^(\d+)(?:-(\d+))?$')
+ROPS = ['replace', 'append', 'concat']
+
 
 def load_json_from_disk(filename):
     """Loads a json file from disk"""
@@ -44,12 +62,213 @@ def load_json_from_disk(filename):
         return json.load(handle)
 
 
+def free_threaded() -> bool:
+    """Checks if the interpreter runs without the GIL"""
+    if not sysconfig.get_config_var('Py_GIL_DISABLED'):
+        return False
+    return not getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def build_book(file: str) -> tuple:
+    """Builds the book in a file, returning the error instead when it fails"""
+    try:
+        book_dict = load_json_from_disk(file)
+        book_type = Library.BOOK_TYPES.get(BookType(book_dict["Type"]), Book)
+        return file, book_type(book=book_dict), None
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        return file, None, f'{type(error).__name__}: {error}'
+
+
+def build_books(files: list, jobs: int = 1) -> list:
+    """Builds the books in parallel, keeping the order of the files"""
+    jobs = jobs or os.cpu_count()
+    if jobs <= 1 or len(files) <= 1:
+        return [build_book(file) for file in files]
+
+    # Threads only pay off without the GIL, otherwise books are built by
+    # worker processes and sent back pickled. The workers aren't forked, the
+    # bot threads could be holding locks (logging, sqlite) at that moment.
+    chunksize = max(1, len(files) // (jobs * 4))
+    workers = min(jobs, len(files))
+    if free_threaded():
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in methods else 'spawn')
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    with pool:
+        return list(pool.map(build_book, files, chunksize=chunksize))
+
+
+def translate_page(page: object, fields: dict) -> object:
+    """Returns a copy of the page that only owns the translated fields"""
+    if not fields:
+        return page
+    result = copy.copy(page)
+    for key, value in fields.items():
+        # A nested table is translated by its own overlay
+        nested = getattr(page, key, None)
+        if isinstance(nested, Book) and isinstance(value, dict):
+            result.__dict__[key] = nested.translated(value)
+        else:
+            result.add(key, value)
+    return result
+
+
+def roll_many(die: str, count: int) -> list:
+    """Rolls the same die expression count times"""
+    match = SIMPLE_DIE.match(die)
+    if not match:
+        return [rolldice.roll_dice(die)[0] for _ in range(count)]
+
+    ndice = int(match.group(1) or 1)
+    faces = range(1, int(match.group(2)) + 1)
+    bonus = int(match.group(4) or 0)
+    if match.group(3) == '-':
+        bonus = -bonus
+    rolls = random.choices(faces, k=ndice * count)
+    return [sum(rolls[i:i+ndice]) + bonus for i in range(0, len(rolls), ndice)]
+
+
 class BookType(Enum):
     """Book type"""
     MONSTER_MANUAL = 1
     TABLE = 2
 
 
+class BookError(ValueError):
+    """A book that doesn't follow the schema of its type"""
+
+
+def normalize_die(die: str) -> str:
+    """Returns a simple die expression as NdS[+-M]"""
+    ndice, faces, sign, bonus = SIMPLE_DIE.match(die).groups()
+    return f'{ndice or 1}d{faces}{sign or ""}{bonus or ""}'
+
+
+def hit_dice(hd: str, die: str = "1d8") -> str:
+    """Returns the die expression for hit points from a HD field"""
+    match = HIT_DICE.match(hd.replace('\\minus ', '-'))
+    if not match:
+        return die
+    dice, fraction, fixed, sign, bonus = match.groups()
+    if fixed:
+        return dice
+    faces = int(die.split("d")[1])
+    if fraction:
+        return f'1d{max(1, faces * int(dice) // int(fraction))}'
+    if bonus:
+        return f'{dice}d{faces} {sign} {bonus}'
+    return f'{dice}d{faces}'
+
+
+def validate_header(book: dict, where: str) -> list:
+    """Returns the problems found in the fields every book json needs"""
+    if not isinstance(book, dict):
+        return [f'{where.rstrip(".") or "book"}: not a book']
+    errors = []
+    for field in ["Id", "Title"]:
+        if not isinstance(book.get(field), str) or not book[field]:
+            errors.append(f'{where}{field}: missing')
+    if not isinstance(book.get("Pages"), list) or \
+            not all(isinstance(page, dict) for page in book["Pages"]):
+        errors.append(f'{where}Pages: not a list of pages')
+    try:
+        BookType(book.get("Type"))
+    except (ValueError, TypeError):
+        errors.append(f'{where}Type: "{book.get("Type")}" is not a book type')
+    return errors
+
+
+def validate_table(book: dict, where: str) -> list:
+    """Returns the problems found in a table json"""
+    errors = validate_header(book, where)
+    if errors:
+        return errors
+    if BookType(book["Type"]) != BookType.TABLE:
+        return [f'{where}Type: "{book["Type"]}" is not a table']
+    if not SIMPLE_DIE.match(str(book.get("Die", ""))):
+        errors.append(f'{where}Die: "{book.get("Die")}" is not a die expression')
+    if not str(book.get("forced_roll", 0)).isdigit():
+        errors.append(f'{where}forced_roll: "{book["forced_roll"]}" is not a number')
+    if book.get("rop", "replace") not in ROPS:
+        errors.append(f'{where}rop: "{book["rop"]}" is not one of {", ".join(ROPS)}')
+
+    for number, entry in enumerate(book["Pages"]):
+        prefix = f'{where}Pages[{number}].'
+        match = isinstance(entry.get("Id"), str) and RANGE_ID.match(entry["Id"])
+        if not match or int(match.group(1)) > int(match.group(2) or match.group(1)):
+            errors.append(f'{prefix}Id: "{entry.get("Id")}" is not a range')
+        if not isinstance(entry.get("Details"), str):
+            errors.append(f'{prefix}Details: missing')
+        if entry.get("Number") and not SIMPLE_DIE.match(str(entry["Number"])):
+            errors.append(f'{prefix}Number: "{entry["Number"]}" is not a die expression')
+        if entry.get("Table"):
+            errors += validate_table(entry["Table"], f'{prefix}Table.')
+    return errors
+
+
+def validate_monsters(book: dict) -> list:
+    """Returns the problems found in a monster manual json"""
+    errors = []
+    for number, page in enumerate(book["Pages"]):
+        prefix = f'Pages[{number}].'
+        for field in ["Id", "Name", "HD"]:
+            if not isinstance(page.get(field), str) or not page[field]:
+                errors.append(f'{prefix}{field}: missing')
+        if isinstance(page.get("HD"), str) and not HIT_DICE.match(
+                page["HD"].replace('\\minus ', '-')):
+            errors.append(f'{prefix}HD: "{page["HD"]}" is not a hit dice expression')
+    return errors
+
+
+def validate_book(book: dict) -> list:
+    """Returns the problems found in a book json against its type schema"""
+    errors = validate_header(book, '')
+    if errors:
+        return errors
+    if BookType(book["Type"]) == BookType.TABLE:
+        return validate_table(book, '')
+    if BookType(book["Type"]) == BookType.MONSTER_MANUAL:
+        return validate_monsters(book)
+    return errors
+
+
+def compile_table(book: dict) -> dict:
+    """Adds the parsed ranges and normalized dice to a valid table json"""
+    book = dict(book, Die=normalize_die(book["Die"]))
+    if "forced_roll" in book:
+        book["forced_roll"] = int(book["forced_roll"])
+    pages = []
+    for entry in book["Pages"]:
+        values = entry["Id"].split("-")
+        entry = dict(entry, Low=int(values[0]), High=int(values[-1]))
+        if entry.get("Number"):
+            entry["Number"] = normalize_die(entry["Number"])
+        if entry.get("Table"):
+            entry["Table"] = compile_table(entry["Table"])
+        pages.append(entry)
+    book["Pages"] = pages
+    return book
+
+
+def compile_book(book: dict) -> dict:
+    """Validates a book json adding the data the runtime would parse"""
+    errors = validate_book(book)
+    if errors:
+        raise BookError("\n".join(errors))
+
+    if BookType(book["Type"]) == BookType.TABLE:
+        book = compile_table(book)
+    elif BookType(book["Type"]) == BookType.MONSTER_MANUAL:
+        book = dict(book, Pages=[dict(page, HitDice=hit_dice(page["HD"]),
+                                      Level=leading_number(page["HD"]))
+                                 for page in book["Pages"]])
+    book["Compiled"] = True
+    return book
+
+
 class Page():  # pylint: disable=too-few-public-methods
     """A book page"""
     def __init__(self, json_dict: dict):
@@ -77,6 +296,10 @@ class GroupOfPages():  # pylint: disable=too-few-public-methods
         self.__pages = [page0, page1]
         self.__gid = page0.Id
 
+    def add(self, page: Page):
+        """Adds another page sharing the same Id"""
+        self.__pages.append(page)
+
     @property
     def Id(self):  # pylint: disable=invalid-name
         """Getter for GroupOfPages Id"""
@@ -144,18 +367,46 @@ class Book():
             return
 
         for page_dict in book['Pages']:
-            page = self.make_page(page_dict)
-            try:
-                page0 = self._pages[page.Id]
-                if isinstance(page0, GroupOfPages):
-                    page0.add(page)
-                    page = page0
-                else:
-                    page = GroupOfPages(page0, page)
-            except KeyError:
-                pass
-
-            self._pages[page.Id] = page
+            self._add_page(self.make_page(page_dict))
+
+    def _add_page(self, page: Page):
+        try:
+            page0 = self._pages[page.Id]
+            if isinstance(page0, GroupOfPages):
+                page0.add(page)
+                page = page0
+            else:
+                page = GroupOfPages(page0, page)
+        except KeyError:
+            pass
+
+        self._pages[page.Id] = page
+
+    def compile(self):
+        """Builds the indexes over the pages"""
+
+    def translated(self, overlay: dict):
+        """Returns a copy of the book with the overlay translations on top"""
+        translations = dict()
+        for page_dict in overlay.get("Pages", []):
+            fields = {key: value for key, value in page_dict.items() if key != "Id"}
+            translations.setdefault(page_dict["Id"], []).append(fields)
+
+        # Untranslated pages and values are shared with this book
+        book = copy.copy(self)
+        book.__title = overlay.get("Title", self.title)
+        book._pages = dict()
+        seen = dict()
+        for group in self.index():
+            for page in getattr(group, 'pages', [group]):
+                fields = translations.get(page.Id, [])
+                position = seen.get(page.Id, 0)
+                seen[page.Id] = position + 1
+                if position < len(fields):
+                    page = translate_page(page, fields[position])
+                book._add_page(page)
+        book.compile()
+        return book
 
     def make_page(self, page_dict: dict):  # pylint: disable=no-self-use
         """Make a page for the book"""
@@ -182,24 +433,40 @@ class Book():
 class MonsterPage(Page):  # pylint: disable=too-few-public-methods
     """Monster"""
 
+    def hit_dice(self, die: str = "1d8") -> str:
+        """Returns the die expression for the monster hit points"""
+        if die == "1d8" and "HitDice" in self.__dict__:
+            return self.HitDice
+        return hit_dice(self.HD, die)
+
     def roll(self, num: int = 1, die: str = "1d8"):
         """Rolls hp for the specified number of monsters"""
-        factors = self.HP.split("+")
-        die = f'{factors[0]} * {die}'
-        hitppoints = []
-        for _ in range(num):
-            result, _ = rolldice.roll_dice(die)
-            hitppoints += [result]
-        return sorted(hitppoints)
+        expression = self.hit_dice(die)
+        if expression.isdigit():
+            return [int(expression)] * num
+        return sorted(max(1, hitpoints) for hitpoints in roll_many(expression, num))
 
 
 class MonsterBook(Book):
     """Monster Manual"""
+    _columns: MonsterColumns
 
     def load(self, book: dict, load_pages: bool = True):
         """Load the book pages into memory"""
         super().load(book, True)
         logging.info('  %d monsters found', len(self._pages))
+        self.compile()
+
+    def compile(self):
+        """Builds the columns used by queries"""
+        self._columns = MonsterColumns(self.index()) if self._pages else None
+
+    @property
+    def columns(self):
+        """Getter for the monster columns used by queries"""
+        if self._columns is None:
+            self._columns = MonsterColumns(self.index())
+        return self._columns
 
     def make_page(self, page_dict: dict):
         """Make a page for the monster book"""
@@ -212,6 +479,11 @@ class TableEntry(Page):  # pylint: disable=too-few-public-methods
     @property
     def result(self):
         """Returns a friendly description for this entry result"""
+        details, _ = self.resolve()
+        return details
+
+    def resolve(self):
+        """Rolls the number appearing and returns the description with it"""
         details = self.Details
         count = 0
         if hasattr(self, 'Number') and self.Number:
@@ -231,7 +503,14 @@ class TableEntry(Page):  # pylint: disable=too-few-public-methods
         details = details.replace('#', '')
         details = details.replace('$', '')
         details = details.replace('  ', ' ')
-        return details
+        return details, count
+
+    @property
+    def id_as_range(self):
+        """Returns a range representing the Id, precomputed on compiled books"""
+        if "High" in self.__dict__:
+            return range(self.Low, self.High + 1)
+        return super().id_as_range
 
     def add(self, key: str, value: any):
         """Adds info to the page"""
@@ -247,6 +526,9 @@ class TableEntry(Page):  # pylint: disable=too-few-public-methods
 class Table(Book):
     """A table is just a small book"""
 
+    __base: int
+    __index: list
+
     def load(self, book: dict, load_pages: bool = True):
         """Load the table entries into memory"""
         super().load(book, True)
@@ -258,32 +540,56 @@ class Table(Book):
         self.rop = "replace"
         if "rop" in book:
             self.rop = book["rop"]
+        self.compile()
         logging.info('  %d entries found', len(self._pages))
 
     def make_page(self, page_dict: dict):
         """Make a table entry for the table"""
         return TableEntry(page_dict)
 
-    def find(self, rid: str):
+    def compile(self):
+        """Builds the index from rolled values to entries"""
+        ranges = [(entry, entry.id_as_range) for entry in self._pages.values()]
+        self.__base = min((rng.start for _, rng in ranges), default=0)
+        top = max((rng.stop for _, rng in ranges), default=0)
+        self.__index = [[] for _ in range(top - self.__base)]
+        for entry, rng in ranges:
+            entries = entry.pages if isinstance(entry, GroupOfPages) else [entry]
+            for rid in rng:
+                self.__index[rid - self.__base] += entries
+
+    def find(self, rid: int):
         """Finds all entries matching in the range IDs"""
-        entries = []
+        offset = int(rid) - self.__base
+        if 0 <= offset < len(self.__index):
+            return self.__index[offset]
+        return []
 
-        for entry in self._pages.values():
-            if rid in entry.id_as_range:
-                if isinstance(entry, GroupOfPages):
-                    entries += entry.pages
-                else:
-                    entries += [entry]
-        return entries
+    def rids(self, count: int = 1) -> list:
+        """Rolls the table die, honouring forced rolls"""
+        if hasattr(self, "forced_roll") and self.forced_roll:
+            return [self.forced_roll] * count
+        return roll_many(self.Die, count)
+
+    @staticmethod
+    def combine(entry: TableEntry, cresult: str, sresult: str) -> str:
+        """Combines an entry result with the one of its chained table"""
+        if not sresult:
+            return cresult
+        if entry.Table.rop == "replace":
+            return sresult
+        if entry.Table.rop == "append":
+            return cresult + "\n" + sresult
+        if entry.Table.rop == "concat":
+            return cresult + sresult
+        return cresult
 
     def roll(self):
         """Rolls on a table and it's chained ones"""
         die = self.Die
-        rid, _ = rolldice.roll_dice(die)
-        if hasattr(self, "forced_roll") and self.forced_roll:
-            rid = self.forced_roll
+        rid = self.rids()[0]
 
-        logging.info("rolled %s in %s for %s", rid, self.Die, self.title)
+        logging.debug("rolled %s in %s for %s", rid, self.Die, self.title)
         entries = self.find(rid)
         result = ""
         explanation = [f'{die} -> **{rid}**']
@@ -292,66 +598,331 @@ class Table(Book):
             # explanation.append(f'**{entry.Id}**. {cresult}')
             if hasattr(entry, 'Table') and entry.Table:
                 sresult, sexpl = entry.Table.roll()
+                cresult = self.combine(entry, cresult, sresult)
                 if sresult:
-                    if entry.Table.rop == "replace":
-                        cresult = sresult
-                    elif entry.Table.rop == "append":
-                        cresult = cresult + "\n" + sresult
-                    elif entry.Table.rop == "concat":
-                        cresult = cresult + sresult
                     explanation += sexpl
             result = result + "\n" + cresult
 
-        logging.info('> %s\n%s', result, "\n".join(explanation))
+        logging.debug('> %s\n%s', result, "\n".join(explanation))
         return result, explanation
 
+    def roll_entries(self) -> list:
+        """Rolls on a table and it's chained ones returning the entries"""
+        rolled = []
+        for entry in self.find(self.rids()[0]):
+            details, count = entry.resolve()
+            rolled += [(entry, details, count)]
+            if hasattr(entry, 'Table') and entry.Table:
+                rolled += entry.Table.roll_entries()
+        return rolled
+
+    def roll_many(self, count: int) -> list:
+        """Rolls count times on a table and it's chained ones in one pass"""
+        rolled = [self.find(rid) for rid in self.rids(count)]
+        logging.debug("rolled %d times in %s for %s", count, self.Die, self.title)
+
+        # Batch the chained tables so every one of them is rolled only once
+        chained = dict()
+        for entries in rolled:
+            for entry in entries:
+                if hasattr(entry, 'Table') and entry.Table:
+                    _, hits = chained.get(id(entry), (entry, 0))
+                    chained[id(entry)] = (entry, hits + 1)
+        subresults = {key: iter(entry.Table.roll_many(hits))
+                      for key, (entry, hits) in chained.items()}
+
+        results = []
+        for entries in rolled:
+            result = ""
+            for entry in entries:
+                cresult = entry.result
+                if id(entry) in subresults:
+                    cresult = self.combine(entry, cresult, next(subresults[id(entry)]))
+                result = result + "\n" + cresult
+            results += [result]
+        return results
+
+
+class StoredMonsterBook(MonsterBook):
+    """Monster Manual whose pages are fetched from the store"""
+
+    def __init__(self, store: LibraryStore, book: dict):
+        self.store = store
+        super().__init__(book=book)
+
+    def make_pages(self, pages: list):
+        """Makes a page, or a group of them, from the stored rows"""
+        pages = [self.make_page(page) for page in pages]
+        if len(pages) > 1:
+            group = GroupOfPages(pages[0], pages[1])
+            for page in pages[2:]:
+                group.add(page)
+            return group
+        return pages[0] if pages else None
+
+    def index(self):
+        """Returns the list of pages in the book"""
+        if self._pages:
+            return super().index()
+        return [self.make_page(page) for page in self.store.monsters(self.bid)]
+
+    def search(self, pid: str):
+        """Returns the page for the specified pid"""
+        if self._pages:
+            return super().search(pid)
+        if not pid:
+            return None
+        return self.make_pages(self.store.monster(self.bid, pid))
+
+
+class StoredTable(Table):
+    """Table whose entries are fetched from the store"""
+
+    def __init__(self, store: LibraryStore, book: dict):
+        self.store = store
+        self.__entries = dict()
+        super().__init__(book=book)
+
+    def compile(self):
+        """The store indexes the entry ranges, unless the entries are in memory"""
+        if self._pages:
+            super().compile()
+
+    def __entry(self, seq: int, data: str):
+        entry = self.__entries.get(seq)
+        if entry is None:
+            entry = self.make_page(json.loads(data))
+            self.__entries[seq] = entry
+        return entry
+
+    def index(self):
+        """Returns the list of entries in the table"""
+        if self._pages:
+            return super().index()
+        return [self.__entry(seq, data) for seq, data in self.store.entries(self.bid)]
+
+    def find(self, rid: int):
+        """Finds all entries matching in the range IDs"""
+        if self._pages:
+            return super().find(rid)
+        return [self.__entry(seq, data)
+                for seq, data in self.store.entries(self.bid, int(rid))]
+
+
+def signature(table: Table) -> tuple:
+    """Returns a hashable description of a table and its entries"""
+    entries = []
+    for group in table.index():
+        for entry in getattr(group, 'pages', [group]):
+            entries.append(tuple(sorted(
+                (key, signature(value) if isinstance(value, Table) else repr(value))
+                for key, value in vars(entry).items())))
+    return (table.bid, table.title, table.Die, table.rop,
+            getattr(table, 'forced_roll', None), tuple(entries))
+
+
+class SymbolTable():
+    """Canonical copies of the values repeated across the pages of a library"""
+    MAX_LENGTH = 64
+
+    __values: dict
+    __tables: dict
+
+    def __init__(self):
+        self.__values = dict()
+        self.__tables = dict()
+
+    def value(self, value: any) -> any:
+        """Returns the canonical copy of a short string"""
+        if isinstance(value, str) and len(value) <= self.MAX_LENGTH:
+            return self.__values.setdefault(value, value)
+        return value
+
+    def page(self, page: Page):
+        """Replaces the page values, and nested tables, by their canonical copies"""
+        values = vars(page)
+        for key, value in values.items():
+            if isinstance(value, Table):
+                values[key] = self.table(value)
+            else:
+                values[key] = self.value(value)
+
+    def table(self, table: Table) -> Table:
+        """Returns the canonical copy of a nested table"""
+        key = signature(table)
+        canonical = self.__tables.get(key)
+        if canonical is None:
+            self.book(table)
+            self.__tables[key] = canonical = table
+        return canonical
+
+    def book(self, book: Book):
+        """Deduplicates the values of the book pages"""
+        for group in book.index():
+            for page in getattr(group, 'pages', [group]):
+                self.page(page)
+
 
 class Library():
     """A collection of books"""
+    BOOK_TYPES = {
+        BookType.MONSTER_MANUAL: MonsterBook,
+        BookType.TABLE: Table,
+    }
+
+    STORED_TYPES = {
+        BookType.MONSTER_MANUAL: StoredMonsterBook,
+        BookType.TABLE: StoredTable,
+    }
+
     settings: object
+    paths: list
+    errors: list
+    symbols: SymbolTable
     __books: dict
+    __mapped: MappedBooks
+    __overlays: dict
+    __translated: dict
 
-    def __init__(self, settings: object):
+    def __init__(self, settings: object, mapped: bool = False):
         self.settings = settings
-        self.load(settings.library_paths)
+        self.paths = settings.library_paths
+        self.__mapped = None
+        self.errors = []
+        self.symbols = SymbolTable() if getattr(settings, 'intern_values', True) else None
+        self.load_overlays(getattr(settings, 'overlays_path', None))
+        if getattr(settings, 'library_backend', 'json') == 'sqlite':
+            self.load_store(self.paths)
+        elif mapped:
+            self.load_mapped(self.paths)
+        else:
+            self.load(self.paths, getattr(settings, 'library_jobs', 1))
 
-    def load(self, library_paths: list = None):
-        """Load the books into memory"""
+    def load(self, library_paths: list = None, jobs: int = 1):
+        """Load the books into memory, using several workers when jobs isn't 1"""
+        self.__books = dict()
+        self.errors = []
+
+        for file, book, error in build_books(book_files(library_paths), jobs):
+            if error:
+                logging.error('book "%s" not loaded: %s', file, error)
+                self.errors.append((file, error))
+                continue
+            self.__adopt(book)
+            logging.info('book "%s [%s]" loaded from "%s"', book.title, book.bid, file)
+
+    def load_mapped(self, library_paths: list):
+        """Maps the compiled library, books are loaded on first use"""
+        filename = mapped_filename(self.settings.CACHE_PATH, library_paths)
+        if is_stale(filename, library_paths):
+            compile_library(filename, library_paths, compile_book)
+        self.__mapped = MappedBooks(filename)
+        if self.__mapped.errors:
+            # The json load is more lenient, books must not depend on the backend
+            logging.error('%d books left out of "%s", loading the json books instead',
+                          len(self.__mapped.errors), filename)
+            self.__mapped = None
+            self.load(library_paths, getattr(self.settings, 'library_jobs', 1))
+            return
+        self.__books = dict.fromkeys(self.__mapped.bids())
+        logging.info('library mapped from "%s" (%d books)', filename, len(self.__books))
+
+    def load_store(self, library_paths: list):
+        """Imports the books into the store, pages are fetched on demand"""
+        filename = mapped_filename(self.settings.CACHE_PATH, library_paths, 'sqlite')
+        store = LibraryStore(filename)
+        files = book_files(library_paths)
+        self.errors = store.import_books(files)
         self.__books = dict()
+        for book_dict in store.books(files):
+            book_type = BookType(book_dict["Type"])
+            book = self.STORED_TYPES[book_type](store, book_dict)
+            book.library = self
+            self.__books[book.bid] = book
+        logging.info('library stored in "%s" (%d books)', filename, len(self.__books))
+
+    def load_overlays(self, overlays_path: str):
+        """Load the translations for every language found in the overlays path"""
+        self.__overlays = dict()
+        self.__translated = dict()
+        if not overlays_path:
+            return
 
-        for books_path in library_paths:
-            files = glob.glob(path.join(books_path, '*.json'))
-            for file in files:
-                logging.info('loading book "%s', file)
-                book = self.add_book(file)
-                logging.info('  book "%s [%s]" loaded', book.title, book.bid)
+        for file in sorted(glob.glob(path.join(overlays_path, '*', '*.json'))):
+            language = path.basename(path.dirname(file))
+            overlay = load_json_from_disk(file)
+            self.__overlays.setdefault(language, dict())[overlay["Id"]] = overlay
+            logging.info('overlay "%s" for "%s" loaded', language, overlay["Id"])
+
+    def languages(self) -> list:
+        """Returns the languages with translations in the library"""
+        return sorted(self.__overlays.keys())
+
+    def translate(self, book: Book, language: str = None) -> Book:
+        """Returns the book translated, or the book itself without translation"""
+        language = language or self.settings.language
+        overlay = self.__overlays.get(language, {}).get(book.bid)
+        if not overlay:
+            return book
+
+        key = (language, book.bid)
+        translated = self.__translated.get(key)
+        if translated is None:
+            translated = book.translated(overlay)
+            self.__translated[key] = translated
+            logging.info('book "%s" translated to "%s"', book.bid, language)
+        return translated
 
     def add_book(self, file: str = None):
         """Add a book into the Library"""
-        book = Book(file)
-        if book.type == BookType.MONSTER_MANUAL:
-            book = MonsterBook(file)
-        elif book.type == BookType.TABLE:
-            book = Table(file)
+        return self.add(load_json_from_disk(file))
+
+    def add(self, book_dict: dict):
+        """Add a book from its json into the Library"""
+        book = self.BOOK_TYPES.get(BookType(book_dict["Type"]), Book)(book=book_dict)
+        self.__adopt(book)
+        return book
+
+    def __adopt(self, book: Book):
+        """Registers a book, sharing its repeated values with the other books"""
+        if self.symbols:
+            self.symbols.book(book)
         book.library = self
         self.__books[book.bid] = book
+
+    def __book(self, bid: str):
+        book = self.__books[bid]
+        if book is None:
+            book = self.add(self.__mapped.load(bid))
         return book
 
+    def __is_monster_book(self, bid: str) -> bool:
+        book = self.__books[bid]
+        if book is None:
+            # Mapped books not loaded yet are told by their header
+            return BookType(self.__mapped.type(bid)) == BookType.MONSTER_MANUAL
+        return isinstance(book, MonsterBook)
+
+    def monster_books(self, language: str = None):
+        """Returns the monster manuals in the library, only they are decoded"""
+        return [self.translate(self.__book(bid), language)
+                for bid in list(self.__books.keys()) if self.__is_monster_book(bid)]
+
     def index(self):
         """Returns the list of books in the library"""
-        result = self.__books.values()
+        result = [self.__book(bid) for bid in list(self.__books.keys())]
         return result
 
-    def search(self, bid: str):
-        """Returns the specified book"""
+    def search(self, bid: str, language: str = None):
+        """Returns the specified book, translated to the language in use"""
         bids = list(filter(lambda x: x.startswith(bid), self.__books.keys()))
         if len(bids) != 1:
             return None
         bid = bids[0]
 
         try:
-            book = self.__books[bid]
-            logging.info('found "%s [%s]" in the library', book.title, book.bid)
+            book = self.translate(self.__book(bid), language)
+            logging.debug('found "%s [%s]" in the library', book.title, book.bid)
             return book
         except KeyError:
             pass
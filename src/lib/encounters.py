@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Encounters rolled on tables with the monsters resolved from a manual.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from lib.books import MonsterBook, MonsterPage, Table, roll_many
+
+WANDERING = re.compile(r'^\s*(\d*d\d+(?:\s*[+-]\s*\d+)?)')
+
+
+def normalize(text: str) -> list:
+    """Lowercase words without accents, markup nor plurals"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r'\$\([^)]*\)', '', text)
+    return [re.sub(r'(?<=[^s])s$', '', word) for word in re.findall(r'[a-z]+', text)]
+
+
+class MonsterIndex():
+    """Index of monster names and aliases"""
+    __keys: dict
+
+    def __init__(self, book: MonsterBook):
+        self.__keys = dict()
+        for monster in book.index():
+            names = [monster.Id.replace('_', ' '), monster.Name]
+            aliases = getattr(monster, 'Aliases', [])
+            if isinstance(aliases, str):
+                aliases = aliases.split(',')
+            for name in names + aliases:
+                words = tuple(normalize(name))
+                if words:
+                    self.__keys.setdefault(words[0], dict())[words] = monster
+
+        # Longest names first so "giant rat" wins over "rat"
+        for first, names in self.__keys.items():
+            self.__keys[first] = sorted(names.items(), key=lambda item: -len(item[0]))
+
+    def match(self, text: str) -> MonsterPage:
+        """Returns the first monster named in the text"""
+        words = normalize(text)
+        for cursor, word in enumerate(words):
+            for name, monster in self.__keys.get(word, []):
+                if tuple(words[cursor:cursor + len(name)]) == name:
+                    return monster
+        return None
+
+
+@lru_cache(maxsize=8)
+def monster_index(book: MonsterBook) -> MonsterIndex:
+    """Returns the cached index for a monster manual"""
+    return MonsterIndex(book)
+
+
+class Group():  # pylint: disable=too-few-public-methods
+    """A group of creatures, or any other result, in an encounter"""
+    __slots__ = ['details', 'count', 'monster', 'hitpoints']
+
+    def __init__(self, details: str, count: int, monster: MonsterPage = None):
+        self.details = details
+        self.count = count
+        self.monster = monster
+        self.hitpoints = []
+
+
+def roll_encounter(table: Table, book: MonsterBook) -> list:
+    """Rolls an encounter resolving the number appearing and hit points"""
+    index = monster_index(book)
+    groups = []
+    for entry, details, count in table.roll_entries():
+        monster = index.match(entry.Details)
+        if monster and not count:
+            wandering = WANDERING.match(monster.Number)
+            count = roll_many(wandering.group(1), 1)[0] if wandering else 1
+        groups.append(Group(details, count, monster))
+
+    # Roll every monster type at once
+    for group in groups:
+        if group.monster:
+            group.hitpoints = group.monster.roll(max(1, group.count))
+    return groups
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Memory footprint of the loaded library.
+
+Objects are measured once, so memory shared between books or pages is only
+accounted to the first one walked.
+"""
+
+import sys
+import types
+from collections import Counter, defaultdict
+from enum import Enum
+
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+              types.MethodType, Enum)
+SKIP_ATTRIBUTES = ['library', 'store']
+TOP_VALUES = 3
+
+
+def deep_size(obj: object, seen: set) -> int:
+    """Returns the size of an object and everything it references not seen yet"""
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, SKIP_TYPES):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack += item.keys()
+            stack += item.values()
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack += item
+        if hasattr(item, '__dict__') and not isinstance(item, dict):
+            attributes = vars(item)
+            if id(attributes) not in seen:
+                seen.add(id(attributes))
+                size += sys.getsizeof(attributes)
+                stack += [value for key, value in attributes.items()
+                          if key not in SKIP_ATTRIBUTES]
+        for slot in getattr(type(item), '__slots__', []):
+            stack.append(getattr(item, slot, None))
+    return size
+
+
+def pages_of(book) -> list:
+    """Returns the pages of a book, with the groups of pages flattened"""
+    return [page for group in book.index() for page in getattr(group, 'pages', [group])]
+
+
+def kib(size: int) -> str:
+    """Formats a size in KiB"""
+    return f'{size / 1024:.1f} KiB'
+
+
+class FieldStats():  # pylint: disable=too-few-public-methods
+    """String values of a page field"""
+    __slots__ = ['references', 'objects', 'wasted']
+
+    def __init__(self):
+        self.references = Counter()
+        self.objects = defaultdict(set)
+        self.wasted = 0
+
+    def add(self, value: str):
+        """Counts a reference to a value, and its copy when it's a new object"""
+        self.references[value] += 1
+        if id(value) not in self.objects[value]:
+            if self.objects[value]:
+                self.wasted += sys.getsizeof(value)
+            self.objects[value].add(id(value))
+
+    @property
+    def copies(self) -> int:
+        """Objects beyond one per distinct value"""
+        return sum(len(ids) for ids in self.objects.values()) - len(self.objects)
+
+
+class Footprint():
+    """Deep memory usage of the books in a library"""
+
+    def __init__(self, library):
+        self.books = []
+        self.types = defaultdict(lambda: [0, 0])
+        self.fields = defaultdict(FieldStats)
+        seen = set()
+        for book in library.index():
+            size = 0
+            pages = pages_of(book)
+            for page in pages:
+                size += self.__page(page, seen)
+            size += deep_size(book, seen)
+            self.books.append((size, book, len(pages)))
+        self.books.sort(key=lambda item: -item[0])
+
+    def __page(self, page, seen: set) -> int:
+        size = 0
+        nested = getattr(page, 'Table', None)
+        if nested:
+            for entry in pages_of(nested):
+                size += self.__page(entry, seen)
+            nested_size = deep_size(nested, seen)
+            self.types['Table (nested)'][0] += 1
+            self.types['Table (nested)'][1] += nested_size
+            size += nested_size
+
+        page_size = deep_size(page, seen)
+        self.types[type(page).__name__][0] += 1
+        self.types[type(page).__name__][1] += page_size
+        for key, value in vars(page).items():
+            if isinstance(value, str):
+                self.fields[key].add(value)
+        return size + page_size
+
+    @property
+    def total(self) -> int:
+        """Bytes used by all the books"""
+        return sum(size for size, _, _ in self.books)
+
+    def candidates(self, ratio: float = 0.5) -> list:
+        """Fields with few distinct values repeated as separate copies"""
+        result = [(field, stats) for field, stats in self.fields.items()
+                  if stats.copies and
+                  len(stats.references) <= ratio * sum(stats.references.values())]
+        return sorted(result, key=lambda item: -item[1].wasted)
+
+    def report(self, top: int = 10) -> list:
+        """Returns the lines of the report"""
+        lines = [f'Library footprint: {kib(self.total)} in {len(self.books)} books', '',
+                 'Largest books:']
+        lines += [f'  {book.bid:<24} {kib(size):>12} {pages:6} pages  {book.title}'
+                  for size, book, pages in self.books[:top]]
+
+        lines += ['', 'Page types:']
+        lines += [f'  {name:<24} {kib(size):>12} {count:6} objects'
+                  for name, (count, size) in sorted(self.types.items(),
+                                                    key=lambda item: -item[1][1])]
+
+        references = sum(sum(stats.references.values()) for stats in self.fields.values())
+        distinct = sum(len(stats.references) for stats in self.fields.values())
+        copies = sum(stats.copies for stats in self.fields.values())
+        wasted = sum(stats.wasted for stats in self.fields.values())
+        lines += ['', f'Strings: {references} field values, {distinct} distinct, '
+                      f'{references - copies - distinct} shared references, '
+                      f'{copies} duplicated copies wasting {kib(wasted)}', '',
+                  'Interning candidates (field: distinct values / references):']
+        for field, stats in self.candidates()[:top]:
+            common = ", ".join(f'"{value[:20]}" x{count}' for value, count
+                               in stats.references.most_common(TOP_VALUES))
+            lines.append(f'  {field:<12} {len(stats.references):5} / '
+                         f'{sum(stats.references.values()):<6} {kib(stats.wasted):>12}'
+                         f'  {common}')
+        return lines
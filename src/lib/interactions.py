@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Application (slash) commands.
+
+discord.py 1.4 doesn't know about interactions, so they are read from the
+raw gateway events and answered through the interaction webhooks. An
+InteractionContext stands in for commands.Context so the cog commands run
+unchanged.
+"""
+
+import inspect
+import logging
+
+import discord
+from discord.http import Route
+
+APPLICATION_COMMAND = 2
+CHANNEL_MESSAGE = 4
+DEFERRED_CHANNEL_MESSAGE = 5
+EPHEMERAL = 64
+
+
+def registration(definitions: dict) -> list:
+    """Returns the payload registering the slash command definitions"""
+    return [{"name": name, "description": definition["description"],
+             "options": definition.get("options", [])}
+            for name, definition in sorted(definitions.items())]
+
+
+def bind(callback: callable, definition: dict, values: dict) -> dict:
+    """Maps the option values to the callback parameters, in the same order"""
+    parameters = list(inspect.signature(callback).parameters)[2:]  # self, ctx
+    return {parameter: values[option["name"]]
+            for option, parameter in zip(definition.get("options", []), parameters)
+            if option["name"] in values}
+
+
+def message(content: str = None, embed: object = None, flags: int = 0) -> dict:
+    """Returns the json of a message for the interaction routes"""
+    data = dict()
+    if content is not None:
+        data['content'] = str(content)
+    if embed is not None:
+        data['embeds'] = [embed.to_dict()]
+    if flags:
+        data['flags'] = flags
+    return data
+
+
+class InteractionUser():  # pylint: disable=too-few-public-methods
+    """The member or user that used a slash command"""
+
+    def __init__(self, data: dict):
+        user = data.get('member', {}).get('user') or data.get('user', {})
+        self.id = int(user.get('id', 0))  # pylint: disable=invalid-name
+        self.name = user.get('username', '')
+        self.display_name = data.get('member', {}).get('nick') or self.name
+        self.mention = f'<@{self.id}>'
+
+    def __str__(self):
+        return self.name
+
+
+class InteractionMessage():  # pylint: disable=too-few-public-methods
+    """A message sent as answer to an interaction"""
+
+    def __init__(self, ctx, message_id: str = '@original'):
+        self.ctx = ctx
+        self.message_id = message_id
+
+    async def edit(self, content: str = None, embed: object = None):
+        """Edits the message"""
+        await self.ctx.request('PATCH', '/webhooks/{application_id}/{token}/messages/'
+                               f'{self.message_id}', content, embed)
+
+
+class InteractionContext():  # pylint: disable=too-many-instance-attributes
+    """Context of a command invoked as a slash command"""
+    prefix = '/'
+    message = None
+    CALLBACK = '/interactions/{interaction_id}/{token}/callback'
+
+    def __init__(self, bot, data: dict):
+        self.bot = bot
+        self.interaction_id = data['id']
+        self.token = data['token']
+        self.application_id = data.get('application_id')
+        self.guild = bot.get_guild(int(data['guild_id'])) if 'guild_id' in data else None
+        self.channel = bot.get_channel(int(data['channel_id'])) or \
+            discord.Object(int(data['channel_id']))
+        self.author = InteractionUser(data)
+        self.options = {option['name']: option.get('value')
+                        for option in data['data'].get('options', [])}
+        self.invoked_with = data['data']['name']
+        self.command = None
+        self.answered = False
+        self.deferred = False
+
+    async def request(self, method: str, url: str, content: str = None,
+                      embed: object = None, flags: int = 0):
+        """Sends a message to an interaction webhook route"""
+        route = Route(method, url, application_id=self.application_id,
+                      token=self.token, interaction_id=self.interaction_id)
+        return await self.bot.http.request(route, json=message(content, embed, flags))
+
+    async def callback(self, response_type: int, data: dict = None):
+        """Answers the interaction"""
+        payload = {"type": response_type}
+        if data is not None:
+            payload["data"] = data
+        route = Route('POST', self.CALLBACK, interaction_id=self.interaction_id,
+                      token=self.token)
+        await self.bot.http.request(route, json=payload)
+        self.answered = True
+
+    async def defer(self):
+        """Acknowledges the interaction so the answer can take its time"""
+        await self.callback(DEFERRED_CHANNEL_MESSAGE)
+        self.deferred = True
+
+    async def send(self, content: str = None, *, embed: object = None,
+                   file: object = None, ephemeral: bool = False):
+        """Answers the interaction, or follows it up once answered"""
+        flags = EPHEMERAL if ephemeral else 0
+        if file is not None:
+            # Webhook uploads need multipart requests, the channel takes them
+            if not isinstance(self.channel, discord.abc.Messageable):
+                self.channel = await self.bot.fetch_channel(self.channel.id)
+            upload = await self.channel.send(file=file)
+            content = f'{content or ""}\n{upload.jump_url}'.strip()
+
+        if self.deferred:
+            self.deferred = False
+            original = InteractionMessage(self)
+            await original.edit(content, embed)
+            return original
+        if not self.answered:
+            await self.callback(CHANNEL_MESSAGE, message(content, embed, flags))
+            return InteractionMessage(self)
+
+        response = await self.request('POST', '/webhooks/{application_id}/{token}',
+                                      content, embed, flags)
+        logging.debug('interaction %s followed up', self.interaction_id)
+        return InteractionMessage(self, response['id'])
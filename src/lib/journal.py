@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Append-only journal of the rolls.
+
+Commands only queue their rolls, a background thread writes them in batches
+so each transaction, and its fsync, covers many rolls.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from os import path
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = FULL;
+CREATE TABLE IF NOT EXISTS rolls (
+    stamp REAL, guild INTEGER, channel INTEGER, user INTEGER, command TEXT,
+    expression TEXT, seed TEXT, result TEXT);
+CREATE INDEX IF NOT EXISTS rolls_channel ON rolls (channel, stamp);
+CREATE INDEX IF NOT EXISTS rolls_guild ON rolls (guild, stamp);
+"""
+
+
+class RollJournal():
+    """Rolls written to a SQLite file by a background thread"""
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 1.0  # seconds
+
+    filename: str
+    __reader: sqlite3.Connection
+    __queue: queue.Queue
+    __writer: threading.Thread
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        os.makedirs(path.dirname(filename), exist_ok=True)
+        self.__reader = sqlite3.connect(filename, check_same_thread=False)
+        self.__reader.executescript(SCHEMA)
+        self.__queue = queue.Queue()
+        self.__writer = threading.Thread(target=self.__write, name='roll-journal',
+                                         daemon=True)
+        self.__writer.start()
+
+    def record(self, ctx, expression: str, seed: int, result: str):
+        """Queues a roll done by a command"""
+        self.__queue.put((time.time(), ctx.guild.id if ctx.guild else None,
+                          ctx.channel.id, ctx.author.id, ctx.command.qualified_name,
+                          expression, f'{seed:x}', str(result)))
+
+    def flush(self):
+        """Waits until the queued rolls are written"""
+        self.__queue.join()
+
+    def close(self):
+        """Writes the queued rolls and stops the writer"""
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__reader.close()
+
+    def __write(self):
+        db = sqlite3.connect(self.filename)
+        running = True
+        while running:
+            batch = [self.__queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while batch[-1] is not None and len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.__queue.get(
+                        timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            try:
+                with db:
+                    db.executemany('INSERT INTO rolls VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   batch)
+            except sqlite3.Error as error:
+                logging.error('%d rolls not journaled: %s', len(batch), error)
+            for _ in range(len(batch) + (0 if running else 1)):
+                self.__queue.task_done()
+        db.close()
+
+    def recap(self, channel: int, since: float, limit: int = 20) -> list:
+        """Returns the last rolls in a channel since a time, oldest first"""
+        rows = self.__reader.execute(
+            'SELECT stamp, user, command, expression, seed, result FROM rolls '
+            'WHERE channel = ? AND stamp >= ? ORDER BY stamp DESC LIMIT ?',
+            (channel, since, limit))
+        return list(reversed(rows.fetchall()))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Library compiled into a single read-only file.
+
+All the books are stored in one file that every process maps in memory, so
+the raw books live once in the page cache and each process only decodes the
+books it actually uses.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from os import path
+
+MAGIC = b'VEBL1\n'
+HEADER = struct.Struct('<Q')
+
+
+def book_files(library_paths: list) -> list:
+    """Returns the json files for the library paths in load order"""
+    files = []
+    for books_path in library_paths:
+        files += sorted(glob.glob(path.join(books_path, '*.json')))
+    return files
+
+
+def mapped_filename(cache_path: str, library_paths: list, extension: str = 'bin') -> str:
+    """Returns the compiled library filename for the library paths"""
+    key = hashlib.blake2b("\n".join(library_paths).encode('utf-8'), digest_size=8)
+    return path.join(cache_path, f'library-{key.hexdigest()}.{extension}')
+
+
+def is_stale(filename: str, library_paths: list) -> bool:
+    """Checks if the compiled library is older than any of its books"""
+    if not path.isfile(filename):
+        return True
+    mtime = path.getmtime(filename)
+    return any(path.getmtime(file) > mtime for file in book_files(library_paths))
+
+
+def compile_library(filename: str, library_paths: list, prepare: callable = None):
+    """Compiles the books into a single file, prepare validates and completes them"""
+    books = []
+    blobs = []
+    errors = []
+    offset = 0
+    for file in book_files(library_paths):
+        with open(file, 'rb') as handle:
+            blob = handle.read()
+        # A broken book is left out, it doesn't stop the others
+        try:
+            book = json.loads(blob)
+            if prepare:
+                book = prepare(book)
+                blob = json.dumps(book, ensure_ascii=False).encode('utf-8')
+            entry = {"Id": book["Id"], "Type": book["Type"], "Title": book["Title"],
+                     "offset": offset, "length": len(blob)}
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            logging.error('book "%s" not compiled:\n%s', file, error)
+            errors.append([file, f'{type(error).__name__}: {error}'])
+            continue
+        books.append(entry)
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({"books": books, "errors": errors}).encode('utf-8')
+    os.makedirs(path.dirname(filename), exist_ok=True)
+    temporary = f'{filename}.{os.getpid()}'
+    with open(temporary, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER.pack(len(header)))
+        handle.write(header)
+        for blob in blobs:
+            handle.write(blob)
+    os.replace(temporary, filename)
+    logging.info('library compiled into "%s" (%d books)', filename, len(books))
+
+
+class MappedBooks():
+    """Books from a compiled library mapped in memory"""
+    __map: mmap.mmap
+    __books: dict
+    __base: int
+    errors: list
+
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as handle:
+            self.__map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__map[:len(MAGIC)] != MAGIC:
+            raise RuntimeError(f'"{filename}" is not a compiled library')
+        start = len(MAGIC) + HEADER.size
+        (length,) = HEADER.unpack(self.__map[len(MAGIC):start])
+        header = json.loads(self.__map[start:start + length])
+        self.__base = start + length
+        self.errors = [tuple(error) for error in header.get("errors", [])]
+        self.__books = dict()
+        for book in header["books"]:
+            self.__books[book["Id"]] = book
+
+    def bids(self) -> list:
+        """Returns the ids of the books in load order"""
+        return list(self.__books.keys())
+
+    def type(self, bid: str) -> int:
+        """Returns the type of the specified book without decoding it"""
+        return self.__books[bid]["Type"]
+
+    def load(self, bid: str) -> dict:
+        """Decodes the specified book"""
+        book = self.__books[bid]
+        offset = self.__base + book["offset"]
+        return json.loads(self.__map[offset:offset + book["length"]])
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Exact probability distributions for dice expressions.
+
+Supports the subset of the rolldice grammar without random termination:
+NdS, keep/drop highest/lowest (K, k, X, x), constants, parenthesis and the
++, - and * operators.
+"""
+
+import re
+from functools import lru_cache
+from itertools import accumulate
+from math import comb, sqrt
+from operator import sub
+
+MAX_OUTCOMES = 100000
+MAX_WORK = 5000000  # ~0.5s of products, above 100d100
+MAX_KEEP_DICE = 30
+MAX_KEEP_WORK = 2500000  # ~0.5s, dice assigned x faces x reachable totals
+
+TOKENS = re.compile(r'\s*(?:(\d*)d(\d+)(?:([KkXx])(\d*))?|(\d+)|([-+*()]))')
+
+
+class OddsError(ValueError):
+    """Expression not supported by the distribution engine"""
+
+
+class Distribution():
+    """Probabilities for consecutive integer outcomes starting at low"""
+    __slots__ = ['low', 'probs']
+
+    def __init__(self, low: int, probs: list):
+        self.low = low
+        self.probs = probs
+        if len(probs) > MAX_OUTCOMES:
+            raise OddsError('too many outcomes')
+
+    @classmethod
+    def constant(cls, value: int):
+        """A distribution with a single outcome"""
+        return cls(value, [1.0])
+
+    @property
+    def high(self) -> int:
+        """Highest outcome"""
+        return self.low + len(self.probs) - 1
+
+    def outcomes(self):
+        """Yields (outcome, probability) pairs"""
+        return zip(range(self.low, self.high + 1), self.probs)
+
+    def mean(self) -> float:
+        """Expected value"""
+        return sum(value * prob for value, prob in self.outcomes())
+
+    def stdev(self) -> float:
+        """Standard deviation"""
+        mean = self.mean()
+        return sqrt(sum((value - mean) ** 2 * prob for value, prob in self.outcomes()))
+
+    def percentile(self, fraction: float) -> int:
+        """Smallest outcome with a cumulative probability of at least fraction"""
+        for value, cumulative in zip(range(self.low, self.high + 1),
+                                     accumulate(self.probs)):
+            if cumulative >= fraction - 1e-12:
+                return value
+        return self.high
+
+    def __add__(self, other):
+        if len(other.probs) == 1:
+            return Distribution(self.low + other.low, self.probs)
+        if len(self.probs) == 1:
+            return other + self
+        if len(self.probs) * len(other.probs) > MAX_WORK:
+            raise OddsError('expression too large')
+        probs = [0.0] * (len(self.probs) + len(other.probs) - 1)
+        for i, prob in enumerate(self.probs):
+            for j, oprob in enumerate(other.probs):
+                probs[i + j] += prob * oprob
+        return Distribution(self.low + other.low, probs)
+
+    def __neg__(self):
+        return Distribution(-self.high, self.probs[::-1])
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __mul__(self, other):
+        corners = [value * ovalue for value in [self.low, self.high]
+                   for ovalue in [other.low, other.high]]
+        if max(corners) - min(corners) >= MAX_OUTCOMES:
+            raise OddsError('too many outcomes')
+        if len(self.probs) * len(other.probs) > MAX_WORK:
+            raise OddsError('expression too large')
+        values = dict()
+        for value, prob in self.outcomes():
+            for ovalue, oprob in other.outcomes():
+                values[value * ovalue] = values.get(value * ovalue, 0.0) + prob * oprob
+        return from_mapping(values)
+
+
+def from_mapping(values: dict) -> Distribution:
+    """Builds a distribution from an outcome to probability mapping"""
+    low, high = min(values), max(values)
+    if high - low >= MAX_OUTCOMES:
+        raise OddsError('too many outcomes')
+    probs = [0.0] * (high - low + 1)
+    for value, prob in values.items():
+        probs[value - low] += prob
+    return Distribution(low, probs)
+
+
+def dice(num: int, faces: int) -> Distribution:
+    """Distribution of the sum of num dice"""
+    if faces < 1:
+        raise OddsError('dice need at least one face')
+    if num * (faces - 1) >= MAX_OUTCOMES:
+        raise OddsError('too many outcomes')
+    if num * num * faces > MAX_WORK:
+        raise OddsError('too many dice')
+
+    # Exact counts, each die is added with a sliding window over prefix sums
+    counts = [1]
+    for _ in range(num):
+        cumulative = list(accumulate(counts))
+        window = [0] * faces + cumulative + cumulative[-1:] * (faces - 1)
+        counts = list(map(sub, window[faces:], window))
+    total = faces ** num
+    return Distribution(num, [count / total for count in counts])
+
+
+def keep(num: int, faces: int, kept: int, highest: bool) -> Distribution:
+    """Distribution of the sum of the kept highest/lowest dice"""
+    kept = max(0, min(kept, num))
+    if kept == num:
+        return dice(num, faces)
+    if num > MAX_KEEP_DICE:
+        raise OddsError(f'keep/drop supports up to {MAX_KEEP_DICE} dice')
+    if num * num * faces * (kept * faces + 1) > MAX_KEEP_WORK:
+        raise OddsError('keep/drop expression too large')
+
+    # Assign dice to faces from the best one, the first ones assigned are kept
+    order = range(faces, 0, -1) if highest else range(1, faces + 1)
+    states = {(0, 0): 1}
+    for face in order:
+        following = dict()
+        for (assigned, total), ways in states.items():
+            left = num - assigned
+            for count in range(left + 1):
+                counted = min(count, max(0, kept - assigned))
+                key = (assigned + count, total + counted * face)
+                following[key] = following.get(key, 0) + ways * comb(left, count)
+        states = following
+
+    total_ways = faces ** num
+    return from_mapping({total: ways / total_ways
+                         for (assigned, total), ways in states.items()
+                         if assigned == num})
+
+
+class Parser():  # pylint: disable=too-few-public-methods
+    """Recursive descent parser building the distribution of an expression"""
+
+    def __init__(self, expression: str):
+        self.tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = TOKENS.match(expression, position)
+            if not match or match.end() == position:
+                raise OddsError(f'unsupported expression near "{expression[position:]}"')
+            self.tokens.append(match.groups())
+            position = match.end()
+        self.cursor = 0
+
+    def __peek(self):
+        if self.cursor < len(self.tokens):
+            return self.tokens[self.cursor][5]
+        return None
+
+    def parse(self) -> Distribution:
+        """Parses the whole expression"""
+        dist = self.__expression()
+        if self.cursor != len(self.tokens):
+            raise OddsError('unexpected trailing tokens')
+        return dist
+
+    def __expression(self) -> Distribution:
+        dist = self.__term()
+        while self.__peek() in ['+', '-']:
+            operator = self.__peek()
+            self.cursor += 1
+            if operator == '+':
+                dist = dist + self.__term()
+            else:
+                dist = dist - self.__term()
+        return dist
+
+    def __term(self) -> Distribution:
+        dist = self.__factor()
+        while self.__peek() == '*':
+            self.cursor += 1
+            dist = dist * self.__factor()
+        return dist
+
+    def __factor(self) -> Distribution:
+        if self.cursor >= len(self.tokens):
+            raise OddsError('unexpected end of expression')
+        num, faces, mode, count, constant, operator = self.tokens[self.cursor]
+        self.cursor += 1
+        if operator == '-':
+            return -self.__factor()
+        if operator == '(':
+            dist = self.__expression()
+            if self.__peek() != ')':
+                raise OddsError('missing ")"')
+            self.cursor += 1
+            return dist
+        if operator:
+            raise OddsError(f'unexpected "{operator}"')
+        if constant:
+            return Distribution.constant(int(constant))
+
+        num = int(num or 1)
+        faces = int(faces)
+        if not mode:
+            return dice(num, faces)
+        count = int(count or 1)  # as rolldice, a single die by default
+        if mode in 'Kk':
+            return keep(num, faces, count, mode == 'K')
+        return keep(num, faces, num - count, mode == 'x')
+
+
+def normalize(expression: str) -> str:
+    """Normalizes an expression so equivalent ones share the cache"""
+    expression = re.sub(r'\s+', '', expression)
+    return re.sub(r'(^|[-+*(])d', r'\g<1>1d', expression)
+
+
+@lru_cache(maxsize=512)
+def _cached_distribution(expression: str) -> Distribution:
+    return Parser(expression).parse()
+
+
+def distribution(expression: str) -> Distribution:
+    """Returns the memoized distribution for a dice expression"""
+    return _cached_distribution(normalize(expression))
+
+
+def histogram(dist: Distribution, bins: int = 12, width: int = 20) -> list:
+    """Compact text histogram of a distribution"""
+    size = -(-len(dist.probs) // bins)
+    rows = []
+    for start in range(0, len(dist.probs), size):
+        prob = sum(dist.probs[start:start + size])
+        low = dist.low + start
+        high = min(low + size - 1, dist.high)
+        label = f'{low}' if low == high else f'{low}-{high}'
+        rows.append((label, prob))
+
+    top = max(prob for _, prob in rows) or 1.0
+    label_width = max(len(label) for label, _ in rows)
+    return [f'{label:>{label_width}} {"█" * round(prob / top * width):<{width}} '
+            f'{prob * 100:5.1f}%' for label, prob in rows]
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Filter expressions over monster manuals.
+
+A query is a comma separated list of clauses, all of them must match:
+    HD 3-5           numeric range on HD, XP or AC
+    AC 2             numeric value on HD, XP or AC
+    XP < 100         comparison (<, <=, >, >=, =, !=) on HD, XP or AC
+    type ape         text field (name, type, alignment) containing a word
+    Neutral          alignment, type or name containing a word
+    sort -xp         sort by a field, descending with "-"
+    book all         monster manuals to search, by id prefix or all of them
+    page 2           page of the results
+"""
+
+import re
+import sys
+from bisect import bisect_left, bisect_right
+
+from lib.store import leading_number
+
+NUMERIC = ['hd', 'xp', 'ac']
+TEXT = ['name', 'type', 'alignment']
+SIGNED = re.compile(r'^\s*(-?\d+)')
+RANGE = re.compile(r'^(\w+)\s+(-?[\d.]+)\s*-\s*(-?[\d.]+)$')
+COMPARISON = re.compile(r'^(\w+)\s*(<=|>=|!=|<|>|=)\s*(-?[\d.]+)$')
+FIELD = re.compile(r'^(\w+)\s+(.+)$')
+INFINITY = float('inf')
+
+
+class QueryError(ValueError):
+    """Invalid monster query"""
+
+
+def armour_class(text: str) -> int:
+    """Returns the numeric armour class"""
+    match = SIGNED.match(str(text))
+    return int(match.group(1)) if match else None
+
+
+def text_value(page: object, field: str) -> str:
+    """Returns the lowercase text of a monster field"""
+    return str(getattr(page, field.capitalize(), '')).lower()
+
+
+class MonsterColumns():
+    """Columns of the monster fields, with the numeric ones parsed once"""
+
+    def __init__(self, pages: list):
+        # Groups of pages sharing an Id are listed as separate monsters
+        self.pages = [page for group in pages
+                      for page in getattr(group, 'pages', [group])]
+        self.numeric = {
+            'hd': [leading_number(getattr(page, 'HD', '')) for page in self.pages],
+            'xp': [leading_number(getattr(page, 'XP', '')) for page in self.pages],
+            'ac': [armour_class(getattr(page, 'AC', '')) for page in self.pages],
+        }
+        # Interned, as alignments and types repeat a lot
+        self.text = {field: [sys.intern(text_value(page, field))
+                             for page in self.pages]
+                     for field in TEXT}
+
+        # Sorted numeric columns to find ranges with bisect
+        self.__sorted = dict()
+        for field, column in self.numeric.items():
+            rows = sorted((value, row) for row, value in enumerate(column)
+                          if value is not None)
+            self.__sorted[field] = ([value for value, _ in rows],
+                                    [row for _, row in rows])
+
+    def between(self, field: str, low: float, high: float) -> set:
+        """Rows with the numeric field in the closed range"""
+        values, rows = self.__sorted[field]
+        return set(rows[bisect_left(values, low):bisect_right(values, high)])
+
+    def containing(self, fields: list, word: str) -> set:
+        """Rows with any of the text fields containing the word"""
+        return {row for field in fields
+                for row, value in enumerate(self.text[field]) if word in value}
+
+
+class Query():
+    """A parsed monster query"""
+    PAGE_SIZE = 25
+
+    def __init__(self, expression: str):
+        self.clauses = []
+        self.sort = 'name'
+        self.descending = False
+        self.page = 1
+        self.book = None
+        for clause in expression.split(','):
+            clause = clause.strip()
+            if clause:
+                self.__parse(clause)
+
+    def __parse(self, clause: str):
+        lowered = clause.lower()
+        match = RANGE.match(lowered)
+        if match and match.group(1) in NUMERIC:
+            field, low, high = match.groups()
+            self.clauses.append(('between', field, float(low), float(high)))
+            return
+        match = COMPARISON.match(lowered)
+        if match:
+            field, operator, value = match.groups()
+            if field not in NUMERIC:
+                raise QueryError(f'"{field}" is not one of {", ".join(NUMERIC)}')
+            self.clauses.append(('compare', field, operator, float(value)))
+            return
+        match = FIELD.match(lowered)
+        if match and match.group(1) == 'sort':
+            self.sort = match.group(2).lstrip('-')
+            self.descending = match.group(2).startswith('-')
+            if self.sort not in NUMERIC + TEXT:
+                raise QueryError(f'can\'t sort by "{self.sort}"')
+            return
+        if match and match.group(1) == 'page':
+            if not match.group(2).isdigit():
+                raise QueryError('page must be a number')
+            self.page = max(1, int(match.group(2)))
+            return
+        if match and match.group(1) == 'book':
+            self.book = clause.split(None, 1)[1]
+            return
+        if match and match.group(1) in NUMERIC:
+            try:
+                value = float(match.group(2))
+            except ValueError:
+                raise QueryError(f'"{match.group(2)}" is not a number') from None
+            self.clauses.append(('between', match.group(1), value, value))
+            return
+        if match and match.group(1) in TEXT:
+            self.clauses.append(('contains', [match.group(1)], match.group(2)))
+            return
+        self.clauses.append(('contains', TEXT, lowered))
+
+    @staticmethod
+    def __rows(columns: MonsterColumns, clause: tuple) -> set:
+        kind = clause[0]
+        if kind == 'between':
+            return columns.between(*clause[1:])
+        if kind == 'contains':
+            return columns.containing(*clause[1:])
+
+        _, field, operator, value = clause
+        low, high = {
+            '<': (-INFINITY, value - 1e-9), '<=': (-INFINITY, value),
+            '>': (value + 1e-9, INFINITY), '>=': (value, INFINITY),
+            '=': (value, value), '!=': (-INFINITY, INFINITY),
+        }[operator]
+        rows = columns.between(field, low, high)
+        if operator == '!=':
+            rows -= columns.between(field, value, value)
+        return rows
+
+    def matches(self, columns: MonsterColumns) -> list:
+        """Returns the rows of the columns matching all the clauses"""
+        rows = set(range(len(columns.pages)))
+        # Narrow with the cheap numeric ranges before scanning text
+        for clause in sorted(self.clauses, key=lambda clause: clause[0] == 'contains'):
+            rows &= self.__rows(columns, clause)
+            if not rows:
+                break
+        return rows
+
+    def run(self, columns_list: list) -> tuple:
+        """Runs the query over several manuals, returns the page and total"""
+        results = []
+        for columns in columns_list:
+            values = columns.numeric.get(self.sort) or columns.text[self.sort]
+            results += [(values[row], columns.pages[row])
+                        for row in self.matches(columns)]
+
+        missing = -INFINITY if self.descending else INFINITY
+        results.sort(key=lambda item: (missing if item[0] is None else item[0],
+                                       item[1].Name), reverse=self.descending)
+        start = (self.page - 1) * self.PAGE_SIZE
+        return [page for _, page in results[start:start + self.PAGE_SIZE]], len(results)
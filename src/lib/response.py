@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Responses of the commands.
+
+A response accumulates the output of a command and sends it at once, or
+edits a placeholder message as the command goes through its stages, split
+to fit the Discord message and embed limits.
+"""
+
+import discord
+
+CONTENT_LIMIT = 2000
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 2048
+FIELDS_LIMIT = 25
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FOOTER_LIMIT = 2048
+EMBED_LIMIT = 6000
+
+
+def split_text(text: str, limit: int) -> list:
+    """Splits a text in chunks within the limit, at line breaks when possible"""
+    chunks = []
+    current = ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f'{current}\n{line}' if current else line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+class Response():
+    """Output of a command, sent once or edited in place"""
+    ctx: object
+    message: discord.Message
+    title: str
+    description: str
+    footer: str
+
+    def __init__(self, ctx, title: str = '', description: str = '', footer: str = ''):
+        self.ctx = ctx
+        self.message = None
+        self.title = title
+        self.description = description
+        self.footer = footer
+        self.__lines = []
+        self.__fields = []
+
+    def add_line(self, text: str):
+        """Adds a line to the message content"""
+        self.__lines.append(text)
+        return self
+
+    def add_field(self, name: str, value: str, inline: bool = True):
+        """Adds an embed field, long values continue in more fields"""
+        name = name[:FIELD_NAME_LIMIT] or '-'
+        for cursor, chunk in enumerate(split_text(str(value) or '-', FIELD_VALUE_LIMIT)):
+            self.__fields.append((name if cursor == 0 else f'{name[:240]} (cont.)',
+                                  chunk, inline))
+        return self
+
+    def __embeds(self) -> list:
+        if not (self.title or self.description or self.__fields):
+            return []
+
+        title = self.title[:TITLE_LIMIT]
+        footer = self.footer[:FOOTER_LIMIT]
+        embeds = [discord.Embed(title=title, description=chunk)
+                  for chunk in split_text(self.description, DESCRIPTION_LIMIT)]
+        size = len(title) + len(embeds[-1].description) + len(footer)
+        for name, value, inline in self.__fields:
+            if len(embeds[-1].fields) >= FIELDS_LIMIT or \
+                    size + len(name) + len(value) > EMBED_LIMIT:
+                embeds.append(discord.Embed(title=title))
+                size = len(title) + len(footer)
+            embeds[-1].add_field(name=name, value=value, inline=inline)
+            size += len(name) + len(value)
+
+        if len(embeds) > 1:
+            for number, embed in enumerate(embeds, 1):
+                embed.title = f'{title[:TITLE_LIMIT - 10]} ({number}/{len(embeds)})'
+        if footer:
+            embeds[-1].set_footer(text=footer)
+        return embeds
+
+    def payloads(self) -> list:
+        """Returns the content and embed of every message to send"""
+        contents = split_text("\n".join(self.__lines), CONTENT_LIMIT) \
+            if self.__lines else []
+        embeds = self.__embeds()
+        count = max(len(contents), len(embeds))
+        return [(contents[cursor] if cursor < len(contents) else None,
+                 embeds[cursor] if cursor < len(embeds) else None)
+                for cursor in range(count)]
+
+    async def progress(self, text: str):
+        """Shows the stage of the command in the placeholder message"""
+        if self.message:
+            await self.message.edit(content=text[:CONTENT_LIMIT])
+        else:
+            self.message = await self.ctx.send(text[:CONTENT_LIMIT])
+
+    async def send(self):
+        """Sends the response, the first message replaces the placeholder"""
+        for content, embed in self.payloads():
+            if self.message:
+                await self.message.edit(content=content, embed=embed)
+                self.message = None
+            else:
+                await self.ctx.send(content, embed=embed)
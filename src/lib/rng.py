@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Seedable random streams.
+
+Every draw gets its own seed derived from the stream seed and a counter, so
+any roll can be replayed from that single number. rolldice and the books use
+the global random module, which is reseeded for the duration of a draw.
+"""
+
+import hashlib
+import logging
+import random
+import secrets
+from contextlib import contextmanager
+
+
+def derive_seed(*keys) -> int:
+    """Derives a 64 bits seed from the given keys"""
+    digest = hashlib.blake2b(repr(keys).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+@contextmanager
+def seeded(seed: int):
+    """Makes the global random module deterministic for the given seed"""
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        yield seed
+    finally:
+        random.setstate(state)
+
+
+class RandomStream():
+    """An independent counter based random stream"""
+    seed: int
+    counter: int
+
+    def __init__(self, seed: int, counter: int = 0):
+        self.seed = seed
+        self.counter = counter
+
+    def next_seed(self) -> int:
+        """Returns the seed for the next draw and advances the stream"""
+        seed = derive_seed(self.seed, self.counter)
+        self.counter += 1
+        return seed
+
+    def spawn(self, key: any):
+        """Returns a child stream, e.g. to hand over to a worker process"""
+        return RandomStream(derive_seed(self.seed, 'spawn', key))
+
+    def draw(self):
+        """Context where all rolls come from the next draw of this stream"""
+        return seeded(self.next_seed())
+
+
+class RandomStreams():
+    """Random streams per guild or session"""
+    seed: int
+    __streams: dict
+
+    def __init__(self, seed: int = None):
+        if seed is None:
+            seed = secrets.randbits(64)
+        self.seed = seed
+        self.__streams = dict()
+        logging.info('random streams seed %x', seed)
+
+    def state(self) -> dict:
+        """Returns the seed and the stream counters to resume the streams"""
+        counters = {key: stream.counter for key, stream in self.__streams.items()}
+        return {"seed": self.seed, "counters": counters}
+
+    @classmethod
+    def restore(cls, state: dict):
+        """Returns the streams resumed from a saved state"""
+        streams = cls(state["seed"])
+        for key, counter in state["counters"].items():
+            streams.get(key).counter = counter
+        return streams
+
+    @staticmethod
+    def key(ctx) -> str:
+        """Stream key for a command context"""
+        if ctx.guild:
+            return f'guild-{ctx.guild.id}'
+        return f'channel-{ctx.channel.id}'
+
+    def get(self, key: str) -> RandomStream:
+        """Returns the stream for the specified key"""
+        try:
+            return self.__streams[key]
+        except KeyError:
+            pass
+        stream = RandomStream(derive_seed(self.seed, key))
+        self.__streams[key] = stream
+        return stream
+
+    def draw(self, ctx):
+        """Context to roll for a command, honouring replays"""
+        seed = getattr(ctx, 'replay_seed', None)
+        if seed is None:
+            seed = self.get(self.key(ctx)).next_seed()
+        logging.debug('roll seed %x for %s', seed, ctx.author)
+        return seeded(seed)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Supervisor running one process per shard.
+"""
+
+import logging
+import multiprocessing
+import signal
+import time
+
+
+class Supervisor():
+    """Runs the shard processes and restarts the ones that crash"""
+    MIN_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+    STABLE_TIME = 60.0
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, target, shard_count: int, args: tuple = ()):
+        self.target = target
+        self.shard_count = shard_count
+        self.args = args
+        self.__context = multiprocessing.get_context('spawn')
+        self.__processes = dict()
+        self.__started = dict()
+        self.__backoff = dict()
+        self.__restart_at = dict()
+        self.__running = False
+
+    def start(self, shard_id: int):
+        """Starts the process for a shard"""
+        process = self.__context.Process(target=self.target, name=f'shard-{shard_id}',
+                                         args=(shard_id, self.shard_count, *self.args))
+        process.start()
+        self.__processes[shard_id] = process
+        self.__started[shard_id] = time.monotonic()
+        logging.info('shard %d started (pid %d)', shard_id, process.pid)
+
+    def check(self):
+        """Schedules restarts for the crashed shards and performs due ones"""
+        now = time.monotonic()
+        for shard_id, process in self.__processes.items():
+            if process.is_alive() or shard_id in self.__restart_at:
+                continue
+            if now - self.__started[shard_id] > self.STABLE_TIME:
+                self.__backoff[shard_id] = self.MIN_BACKOFF
+            backoff = self.__backoff.get(shard_id, self.MIN_BACKOFF)
+            logging.error('shard %d exited with %s, restarting in %.1fs',
+                          shard_id, process.exitcode, backoff)
+            self.__restart_at[shard_id] = now + backoff
+            self.__backoff[shard_id] = min(backoff * 2, self.MAX_BACKOFF)
+
+        for shard_id, restart_at in list(self.__restart_at.items()):
+            if restart_at <= now:
+                del self.__restart_at[shard_id]
+                self.start(shard_id)
+
+    def stop(self, *_):
+        """Stops supervising and terminates the shards"""
+        self.__running = False
+
+    def run(self):
+        """Runs all the shards until stopped"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.__running = True
+        for shard_id in range(self.shard_count):
+            self.start(shard_id)
+
+        while self.__running:
+            time.sleep(self.POLL_INTERVAL)
+            self.check()
+
+        for process in self.__processes.values():
+            process.terminate()
+        for process in self.__processes.values():
+            process.join()
+        logging.info('all shards stopped')
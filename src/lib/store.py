@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+SQLite storage for the library.
+
+Books are imported once into a database with indexes on the monster columns
+and the table entry ranges, so pages are only fetched when they are needed.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    bid TEXT PRIMARY KEY, type INTEGER, title TEXT, die TEXT, rop TEXT,
+    forced_roll INTEGER, source TEXT, mtime REAL);
+CREATE TABLE IF NOT EXISTS monsters (
+    bid TEXT, seq INTEGER, id TEXT, name TEXT, type TEXT, hd REAL, xp INTEGER,
+    data TEXT);
+CREATE INDEX IF NOT EXISTS monsters_id ON monsters (bid, id);
+CREATE INDEX IF NOT EXISTS monsters_name ON monsters (bid, name);
+CREATE INDEX IF NOT EXISTS monsters_type ON monsters (bid, type);
+CREATE INDEX IF NOT EXISTS monsters_hd ON monsters (bid, hd);
+CREATE INDEX IF NOT EXISTS monsters_xp ON monsters (bid, xp);
+CREATE TABLE IF NOT EXISTS entries (
+    bid TEXT, seq INTEGER, id TEXT, low INTEGER, high INTEGER, data TEXT);
+CREATE INDEX IF NOT EXISTS entries_range ON entries (bid, low, high);
+"""
+
+NUMBER = re.compile(r'^\s*(\d+)(?:/(\d+))?')
+
+
+def leading_number(text: str) -> float:
+    """Returns the number a field starts with, e.g. 4 for HD "4+1*" """
+    match = NUMBER.match(str(text))
+    if not match:
+        return None
+    if match.group(2):
+        return int(match.group(1)) / int(match.group(2))
+    return int(match.group(1))
+
+
+class LibraryStore():
+    """Books stored in a SQLite database"""
+    ROW_CACHE = 1024
+
+    def __init__(self, filename: str):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.__db = sqlite3.connect(filename, check_same_thread=False)
+        self.__db.executescript(SCHEMA)
+        self.monster = lru_cache(maxsize=self.ROW_CACHE)(self.__monster)
+
+    def import_books(self, files: list) -> list:
+        """Imports the books that changed since the last import, returns the errors"""
+        known = dict(self.__db.execute('SELECT source, mtime FROM books'))
+        errors = []
+        for file in files:
+            try:
+                mtime = os.path.getmtime(file)
+                if known.get(file) == mtime:
+                    continue
+                with open(file, 'r') as handle:
+                    book = json.load(handle)
+                with self.__db:
+                    self.__import(book, file, mtime)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+                # A broken book is left out, as the json backend does
+                error = f'{type(error).__name__}: {error}'
+                logging.error('book "%s" not imported: %s', file, error)
+                errors.append((file, error))
+                with self.__db:
+                    self.__forget(file)
+                continue
+            logging.info('book "%s" imported into the store', file)
+        self.monster.cache_clear()
+        return errors
+
+    def __forget(self, source: str):
+        for (bid,) in list(self.__db.execute('SELECT bid FROM books WHERE source = ?',
+                                             (source,))):
+            self.__delete(bid, source)
+
+    def __delete(self, bid: str, source: str):
+        self.__db.execute('DELETE FROM books WHERE bid = ? OR source = ?', (bid, source))
+        self.__db.execute('DELETE FROM monsters WHERE bid = ?', (bid,))
+        self.__db.execute('DELETE FROM entries WHERE bid = ?', (bid,))
+
+    def __import(self, book: dict, source: str, mtime: float):
+        bid = book["Id"]
+        self.__delete(bid, source)
+        self.__db.execute('INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                          (bid, book["Type"], book["Title"], book.get("Die"),
+                           book.get("rop"), book.get("forced_roll"), source, mtime))
+        for seq, page in enumerate(book["Pages"]):
+            data = json.dumps(page, ensure_ascii=False)
+            if "Die" in book:
+                values = page["Id"].split("-")
+                self.__db.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                                  (bid, seq, page["Id"], int(values[0]), int(values[-1]),
+                                   data))
+            else:
+                self.__db.execute('INSERT INTO monsters VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                  (bid, seq, page["Id"], page.get("Name"),
+                                   page.get("Type"), leading_number(page.get("HD", "")),
+                                   leading_number(page.get("XP", "")), data))
+
+    def books(self, sources: list) -> list:
+        """Returns the headers of the books imported from the sources"""
+        rows = self.__db.execute('SELECT bid, type, title, die, rop, forced_roll, '
+                                 'source FROM books ORDER BY source')
+        result = []
+        for bid, btype, title, die, rop, forced_roll, source in rows:
+            if source not in sources:
+                continue
+            book = {"Id": bid, "Type": btype, "Title": title, "Die": die, "rop": rop,
+                    "forced_roll": forced_roll, "Pages": []}
+            result.append({key: value for key, value in book.items()
+                           if value is not None})
+        return result
+
+    def __monster(self, bid: str, pid: str) -> list:
+        return [json.loads(data) for (data,) in self.__db.execute(
+            'SELECT data FROM monsters WHERE bid = ? AND id = ? ORDER BY seq',
+            (bid, pid))]
+
+    def monsters(self, bid: str) -> list:
+        """Returns all the monsters in a book"""
+        return [json.loads(data) for (data,) in self.__db.execute(
+            'SELECT data FROM monsters WHERE bid = ? ORDER BY seq', (bid,))]
+
+    def entries(self, bid: str, rid: int = None) -> list:
+        """Returns the (seq, entry) matching a roll, or all of them"""
+        if rid is None:
+            rows = self.__db.execute('SELECT seq, data FROM entries WHERE bid = ? '
+                                     'ORDER BY seq', (bid,))
+        else:
+            rows = self.__db.execute('SELECT seq, data FROM entries WHERE bid = ? '
+                                     'AND low <= ? AND high >= ? ORDER BY seq',
+                                     (bid, rid, rid))
+        return list(rows)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Outcome statistics for tables and their chained tables.
+"""
+
+import random
+from collections import Counter
+from itertools import accumulate
+
+from lib.books import GroupOfPages, Table
+from lib.odds import Distribution, distribution
+
+
+class EntryStats():  # pylint: disable=too-few-public-methods
+    """Statistics for a table entry"""
+    __slots__ = ['path', 'entry', 'probability', 'hits']
+
+    def __init__(self, path: str, entry: object):
+        self.path = path
+        self.entry = entry
+        self.probability = 0.0
+        self.hits = 0
+
+    @property
+    def number(self) -> str:
+        """Mean of the Number dice, if any"""
+        if not getattr(self.entry, 'Number', None):
+            return ""
+        try:
+            return f'{distribution(self.entry.Number).mean():.1f}'
+        except ValueError:
+            return self.entry.Number
+
+
+class TableStats():
+    """Exact and simulated statistics for a table tree"""
+    __stats: list
+    __by_key: dict
+
+    def __init__(self, table: Table):
+        self.table = table
+        self.__stats = []
+        self.__by_key = dict()
+        self.__collect(table, "", ())
+
+    def __collect(self, table: Table, prefix: str, parent: tuple):
+        for page in table.index():
+            entries = page.pages if isinstance(page, GroupOfPages) else [page]
+            for entry in entries:
+                stats = EntryStats(f'{prefix}{entry.Id}', entry)
+                self.__stats.append(stats)
+                # Ids repeat and nested tables may be shared between entries,
+                # the key is the chain of entries leading to this one
+                key = parent + (id(entry),)
+                self.__by_key[key] = stats
+                if getattr(entry, 'Table', None):
+                    self.__collect(entry.Table, f'{stats.path}>', key)
+
+    @property
+    def stats(self) -> list:
+        """Statistics for all the entries in the tree"""
+        return self.__stats
+
+    @property
+    def unreachable(self) -> list:
+        """Entries that can't be rolled"""
+        return [stats for stats in self.__stats if stats.probability == 0.0]
+
+    @staticmethod
+    def die(table: Table) -> Distribution:
+        """Distribution of the table die"""
+        if getattr(table, 'forced_roll', None):
+            return Distribution.constant(int(table.forced_roll))
+        return distribution(table.Die)
+
+    def exact(self):
+        """Computes the exact probability for every entry"""
+        for stats in self.__stats:
+            stats.probability = 0.0
+        self.__exact(self.table, 1.0, ())
+        return self
+
+    def __exact(self, table: Table, weight: float, parent: tuple):
+        local = dict()
+        for rid, prob in self.die(table).outcomes():
+            for entry in table.find(rid):
+                _, total = local.get(id(entry), (entry, 0.0))
+                local[id(entry)] = (entry, total + prob)
+
+        for entry, prob in local.values():
+            key = parent + (id(entry),)
+            self.__by_key[key].probability += weight * prob
+            if getattr(entry, 'Table', None):
+                self.__exact(entry.Table, weight * prob, key)
+
+    def simulate(self, count: int, rng: random.Random = None):
+        """Simulates count rolls on the table tree"""
+        for stats in self.__stats:
+            stats.hits = 0
+        self.__simulate(self.table, count, rng or random.Random(), ())
+        return self
+
+    def __simulate(self, table: Table, count: int, rng: random.Random, parent: tuple):
+        die = self.die(table)
+        rids = Counter(rng.choices(range(die.low, die.high + 1),
+                                   cum_weights=list(accumulate(die.probs)), k=count))
+        local = dict()
+        for rid, hits in rids.items():
+            for entry in table.find(rid):
+                _, total = local.get(id(entry), (entry, 0))
+                local[id(entry)] = (entry, total + hits)
+
+        for entry, hits in local.values():
+            key = parent + (id(entry),)
+            self.__by_key[key].hits += hits
+            if getattr(entry, 'Table', None):
+                self.__simulate(entry.Table, hits, rng, key)
+
+    def report(self, count: int = 0, width: int = 50) -> list:
+        """Formats the statistics, with simulated frequencies when count is set"""
+        lines = []
+        for stats in self.__stats:
+            frequency = f'{stats.probability * 100:6.2f}%'
+            if count:
+                frequency += f' {stats.hits / count * 100:6.2f}%'
+            details = " ".join(stats.entry.Details.split())[:width]
+            number = f' [avg {stats.number}]' if stats.number else ""
+            lines.append(f'{stats.path:<8} {frequency} {details}{number}')
+        return lines
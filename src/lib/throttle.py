@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Command throttling with token buckets per user, channel and guild.
+"""
+
+import time
+
+
+class TokenBucket():  # pylint: disable=too-few-public-methods
+    """Tokens refilled at a rate up to a capacity"""
+    __slots__ = ['tokens', 'stamp']
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.stamp = now
+
+    def refill(self, rate: float, capacity: float, now: float) -> float:
+        """Refills the bucket and returns the available tokens"""
+        self.tokens = min(capacity, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        return self.tokens
+
+
+class Throttle():
+    """Limits the commands per user, channel and guild"""
+    BURST_SECONDS = 20
+    PRUNE_INTERVAL = 300
+    COSTS = {
+        'rollcharacter': 5,
+        'mlist': 5,
+        'encounter': 2,
+        'tstats': 10,
+        'odds': 2,
+    }
+    SCOPES = ['user', 'channel', 'guild']
+
+    def __init__(self, settings: object):
+        self.settings = settings
+        self.__buckets = {scope: dict() for scope in self.SCOPES}
+        self.__notices = dict()
+        self.__pruned = time.monotonic()
+
+    def cost(self, ctx) -> int:
+        """Tokens consumed by a command"""
+        return self.COSTS.get(ctx.command.qualified_name, 1)
+
+    def check(self, ctx) -> float:
+        """Consumes the command tokens, returns the seconds to wait if throttled"""
+        now = time.monotonic()
+        cost = self.cost(ctx)
+        keys = {'user': ctx.author.id, 'channel': ctx.channel.id,
+                'guild': ctx.guild.id if ctx.guild else None}
+
+        buckets = []
+        wait = 0.0
+        for scope in self.SCOPES:
+            rate = getattr(self.settings, f'{scope}_rate') / 60
+            if not rate or keys[scope] is None:
+                continue
+            capacity = max(cost, rate * self.BURST_SECONDS)
+            bucket = self.__buckets[scope].get(keys[scope])
+            if bucket is None:
+                bucket = TokenBucket(capacity, now)
+                self.__buckets[scope][keys[scope]] = bucket
+            tokens = bucket.refill(rate, capacity, now)
+            wait = max(wait, (cost - tokens) / rate)
+            buckets.append(bucket)
+
+        if wait > 0:
+            return wait
+        for bucket in buckets:
+            bucket.tokens -= cost
+        if now - self.__pruned > self.PRUNE_INTERVAL:
+            self.prune(now)
+        return 0.0
+
+    def should_notify(self, user_id: int, wait: float) -> bool:
+        """Only one notice per user while throttled"""
+        now = time.monotonic()
+        if self.__notices.get(user_id, 0.0) > now:
+            return False
+        self.__notices[user_id] = now + wait
+        return True
+
+    def prune(self, now: float):
+        """Forgets the buckets idle for long enough to be full again"""
+        idle = self.BURST_SECONDS * 2
+        for buckets in self.__buckets.values():
+            for key in [key for key, bucket in buckets.items()
+                        if now - bucket.stamp > idle]:
+                del buckets[key]
+        self.__notices = {key: until for key, until in self.__notices.items()
+                          if until > now}
+        self.__pruned = now
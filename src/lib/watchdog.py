@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+"""
+Event loop lag monitor.
+
+A task in the loop records a heartbeat and its wake up lag. A thread checks
+the heartbeat and, when the loop is blocked longer than the threshold,
+logs the stack of the loop thread while it's still stuck.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class LoopWatchdog():  # pylint: disable=too-many-instance-attributes
+    """Measures the event loop lag and reports what blocks it"""
+    INTERVAL = 0.1
+
+    command: str
+    __threshold: float
+
+    def __init__(self, threshold: float):
+        self.__threshold = threshold
+        self.command = ""
+        self.stalls = 0
+        self.__lags = deque(maxlen=600)
+        self.__max_lag = 0.0
+        self.__beat = time.monotonic()
+        self.__loop = None
+        self.__loop_thread = None
+
+    @property
+    def threshold(self) -> float:
+        """Seconds the loop can be blocked before reporting it"""
+        return self.__threshold
+
+    @threshold.setter
+    def threshold(self, threshold: float):
+        self.__threshold = threshold
+        if self.__loop:
+            self.__loop.slow_callback_duration = threshold
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Starts monitoring the loop, it must be called from the loop thread"""
+        if self.__loop:
+            return
+        self.__loop = loop
+        self.__loop_thread = threading.get_ident()
+        loop.slow_callback_duration = self.threshold
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            loop.set_debug(True)
+        loop.create_task(self.__probe())
+        threading.Thread(target=self.__watch, name='watchdog', daemon=True).start()
+
+    async def __probe(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.INTERVAL)
+            self.__beat = time.monotonic()
+            lag = self.__beat - start - self.INTERVAL
+            self.__lags.append(lag)
+            self.__max_lag = max(self.__max_lag, lag)
+
+    def __watch(self):
+        reported = 0.0
+        while not self.__loop.is_closed():
+            time.sleep(self.INTERVAL)
+            beat = self.__beat
+            blocked = time.monotonic() - beat - self.INTERVAL
+            if blocked < self.threshold or reported == beat:
+                continue
+            reported = beat
+            self.stalls += 1
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            frame = frames.get(self.__loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logging.warning('event loop blocked for %.0fms, last command "%s"\n%s',
+                            blocked * 1000, self.command, stack)
+
+    @property
+    def lag(self) -> float:
+        """Average lag over the last minute"""
+        if not self.__lags:
+            return 0.0
+        return sum(self.__lags) / len(self.__lags)
+
+    def details(self) -> str:
+        """Provides a string with the loop lag to show at !info"""
+        return f"- **lag**: [{self.lag * 1000:.1f}ms]\n" \
+               f"- **max lag**: [{self.__max_lag * 1000:.1f}ms]\n" \
+               f"- **stalls**: [{self.stalls}]\n"
@@ -34,6 +34,8 @@ Usage:
 Options:
     -h --help             Show this message
     --token=TOKEN         Bot security token
+    --shards=COUNT        Number of shard processes to run [default: 1]
+    --api=URL             Discord API base url (e.g. a local fake gateway)
     --version             Show version
     --log-level=LEVEL     Level of logging to produce [default: INFO]
     --log-file=PATH       Specify a file to write the log
@@ -43,13 +45,20 @@ Log levels:  DEBUG INFO WARNING ERROR CRITICAL
 
 """
 
+import ast
+import asyncio
 import json
 import logging
+import os
+import signal
 import sys
+import time
 from os import path, listdir
+import discord
 from discord import Activity, ActivityType
 from discord.ext import commands
 from discord.ext.commands.errors import BotMissingPermissions, \
+    CheckFailure, \
     MissingPermissions, \
     NotOwner, \
     MissingRequiredArgument, \
@@ -57,17 +66,47 @@ from discord.ext.commands.errors import BotMissingPermissions, \
 
 from docopt import docopt
 
-from lib.books import load_json_from_disk, Library
+from lib.assets import StaticAssets
+from lib.books import compile_book, load_json_from_disk, Library
+from lib.interactions import APPLICATION_COMMAND, InteractionContext, bind, \
+    registration
+from lib.journal import RollJournal
+from lib.mapped import compile_library, is_stale, mapped_filename
+from lib.response import Response
+from lib.rng import RandomStreams
+from lib.shards import Supervisor
+from lib.throttle import Throttle
+from lib.watchdog import LoopWatchdog
 
 CURDIR = path.dirname(path.abspath(__file__))
 TOPDIR = path.dirname(CURDIR)
 
 
+class ShuttingDown(CheckFailure):
+    """Command rejected while the bot shuts down"""
+    def __init__(self):
+        super().__init__('Restarting, try again in a moment.')
+
+
+class Throttled(CheckFailure):
+    """Command rejected by the throttling"""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f'Slow down! Try again in {retry_after:.0f}s.')
+
+
 class Settings():  # pylint: disable=too-many-instance-attributes
     """Application settings"""
     SETTINGS_FILE: str = path.abspath('.vebot.json')
+    CACHE_PATH: str = path.abspath('.vebot-cache')
+    JOURNAL_FILE: str = path.abspath('.vebot-journal.sqlite')
     USER_FACING_SETTINGS: list = ['language', 'opengame', 'system', 'mode',
-                                  'attributes', 'score_threshold', 'monsters']
+                                  'attributes', 'score_threshold', 'monsters',
+                                  'lag_threshold', 'user_rate', 'channel_rate',
+                                  'guild_rate', 'library_backend', 'prefix_commands',
+                                  'slash_commands']
+    MINIMUM_VALUES: dict = {'lag_threshold': 1, 'user_rate': 0, 'channel_rate': 0,
+                            'guild_rate': 0}
     __filename: str
     token: str
     language: str
@@ -77,6 +116,15 @@ class Settings():  # pylint: disable=too-many-instance-attributes
     attributes: str
     score_threshold: int
     monsters: str
+    lag_threshold: int
+    user_rate: int
+    channel_rate: int
+    guild_rate: int
+    avatar_hashes: dict
+    library_backend: str
+    library_jobs: int
+    prefix_commands: str
+    slash_commands: str
 
     def __init__(self):
         self.token = ""
@@ -88,8 +136,29 @@ class Settings():  # pylint: disable=too-many-instance-attributes
         self.score_threshold = 60
         self.books_path = path.join(TOPDIR, 'books')
         self.monsters = "mmbecmi"
+        self.lag_threshold = 250  # ms
+        self.user_rate = 20  # tokens per minute
+        self.channel_rate = 60
+        self.guild_rate = 240
+        # local avatar hash -> discord avatar hash, seeded with the bundled one
+        self.avatar_hashes = {'21963c653561cd85cbc6b7d1191b6d29':
+                              '0e2cba3d8bec4ff4db557700231b3c10'}
+        self.library_backend = "json"
+        self.library_jobs = 1  # 0 uses every core
+        self.prefix_commands = "yes"
+        self.slash_commands = "no"
         self.load()
 
+    @property
+    def monster_book(self) -> str:
+        """Id of the monster manual in use"""
+        return self.monsters
+
+    @property
+    def overlays_path(self) -> str:
+        """Path of the translations, one directory per language"""
+        return path.join(self.books_path, 'overlays')
+
     @property
     def library_paths(self) -> list:
         """Computes library paths"""
@@ -105,6 +174,13 @@ class Settings():  # pylint: disable=too-many-instance-attributes
         """Changes a setting value saving it on disk too"""
         if valid_values and value not in valid_values:
             return False
+        if isinstance(self.__dict__.get(key), int):
+            try:
+                value = int(value)
+            except ValueError:
+                return False
+        if value < self.MINIMUM_VALUES.get(key, value):
+            return False
         self.__dict__[key] = value
         self.save()
         return True
@@ -121,6 +197,10 @@ class Settings():  # pylint: disable=too-many-instance-attributes
             valid_values = ['ve', 'ose']
         elif setting == 'attributes':
             valid_values = ['inorder', 'inorder+', 've', 'heroic']
+        elif setting == 'library_backend':
+            valid_values = ['json', 'sqlite']
+        elif setting in ['prefix_commands', 'slash_commands']:
+            valid_values = ['yes', 'no']
         return valid_values
 
     def load(self):
@@ -148,59 +228,191 @@ class Settings():  # pylint: disable=too-many-instance-attributes
                f"- **mode**: [{self.mode}]\n" \
                f"- **attributes**: [{self.attributes}]\n " \
                f"- **score_threshold**: [{self.score_threshold}]\n " \
-               f"- **monsters**: [{self.monsters}]\n"
+               f"- **monsters**: [{self.monsters}]\n" \
+               f"- **lag_threshold**: [{self.lag_threshold}ms]\n" \
+               f"- **rates**: [{self.user_rate}/{self.channel_rate}/{self.guild_rate}" \
+               " per minute]\n" \
+               f"- **library_backend**: [{self.library_backend}]\n" \
+               f"- **commands**: [prefix {self.prefix_commands}," \
+               f" slash {self.slash_commands}]\n"
+
+
+def scan_signature(node: ast.FunctionDef) -> str:
+    """Builds the usage of a command from its parameters, as discord.py shows it"""
+    params = node.args.args[2:]  # self, ctx
+    defaults = [None] * (len(params) - len(node.args.defaults)) + node.args.defaults
+    params += node.args.kwonlyargs
+    defaults += node.args.kw_defaults
+    usage = []
+    for param, default in zip(params, defaults):
+        if default is None:
+            usage.append(f'<{param.arg}>')
+            continue
+        try:
+            value = ast.literal_eval(default)
+        except ValueError:
+            value = None
+        if value in [None, ""]:
+            usage.append(f'[{param.arg}]')
+        else:
+            usage.append(f'[{param.arg}={value}]')
+    if node.args.vararg:
+        usage.append(f'[{node.args.vararg.arg}...]')
+    return " ".join(usage)
+
+
+def scan_commands(filename: str) -> list:
+    """Scans a cog source, without importing it, for its top level commands"""
+    with open(filename, 'r') as handle:
+        tree = ast.parse(handle.read())
+
+    result = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            # Subcommands, like @group.command(), are loaded with their group
+            if not isinstance(decorator, ast.Call) or \
+                    getattr(decorator.func, 'attr', '') not in ['command', 'group'] or \
+                    getattr(decorator.func.value, 'id', '') != 'commands':
+                continue
+            options = {keyword.arg: ast.literal_eval(keyword.value)
+                       for keyword in decorator.keywords
+                       if keyword.arg in ['name', 'aliases', 'help', 'brief', 'usage']}
+            result += [(options.get('name', node.name), options.get('aliases', []),
+                        {"help": options.get('help', ast.get_docstring(node)),
+                         "brief": options.get('brief'),
+                         "usage": options.get('usage', scan_signature(node))})]
+    return result
+
+
+def scan_slash_commands(filename: str) -> dict:
+    """Scans a cog source for the SLASH_COMMANDS definitions of its cog class"""
+    with open(filename, 'r') as handle:
+        tree = ast.parse(handle.read())
+
+    result = dict()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and \
+                any(getattr(target, 'id', '') == 'SLASH_COMMANDS'
+                    for target in node.targets):
+            result.update(ast.literal_eval(node.value))
+    return result
 
 
 class Cogs():
     """Handles the list of Cogs"""
     __COG_PATH = path.join(CURDIR, 'cogs')
-    __cogs: list
+    __manifests: dict
+    __manifest: dict
+    __slash: dict
 
     def __init__(self):
+        self.__manifests = dict()
         self.reload([])
 
-    def __is_cog(self, file: str, cog_path: str = "") -> bool:
-        if not cog_path:
-            cog_path = self.__COG_PATH
-        return path.isfile(path.join(cog_path, file))
+    @staticmethod
+    def __scan(cog_path: str, package: str) -> dict:
+        """Maps the module name of every cog in a directory to its commands"""
+        return {f'{package}.{cog[:-3]}': scan_commands(path.join(cog_path, cog))
+                for cog in sorted(listdir(cog_path))
+                if cog.endswith('.py') and path.isfile(path.join(cog_path, cog))}
+
+    @staticmethod
+    def __scan_slash(cog_path: str, package: str) -> dict:
+        """Maps every slash command in a directory to its cog and definition"""
+        return {name: (f'{package}.{cog[:-3]}', definition)
+                for cog in sorted(listdir(cog_path))
+                if cog.endswith('.py') and path.isfile(path.join(cog_path, cog))
+                for name, definition in
+                scan_slash_commands(path.join(cog_path, cog)).items()}
 
     def reload(self, subdirs: list):
         """reloads the cog list with the selected mode"""
-        self.__cogs = [f'cogs.{cog.replace(".py","")}'
-                       for cog in listdir(self.__COG_PATH) if self.__is_cog(cog)]
-
-        for sub in subdirs:
-            if not sub:
-                continue
-            sub_path = path.join(self.__COG_PATH, sub)
-            if path.isdir(sub_path):
-                self.__cogs += [f'cogs.{sub_path}.{cog.replace(".py","")}'
-                                for cog in listdir(sub_path) if self.__is_cog(cog)]
+        key = tuple(sub for sub in subdirs if sub)
+        if key not in self.__manifests:
+            manifest = self.__scan(self.__COG_PATH, 'cogs')
+            slash = self.__scan_slash(self.__COG_PATH, 'cogs')
+            for sub in key:
+                sub_path = path.join(self.__COG_PATH, sub)
+                if path.isdir(sub_path):
+                    manifest.update(self.__scan(sub_path, f'cogs.{sub}'))
+                    slash.update(self.__scan_slash(sub_path, f'cogs.{sub}'))
+            self.__manifests[key] = (manifest, slash)
+        self.__manifest, self.__slash = self.__manifests[key]
 
     def get(self) -> list:
         """returns the list of cogs to be loaded"""
-        return self.__cogs
+        return list(self.__manifest.keys())
+
+    def commands(self, cog: str) -> list:
+        """returns the commands names, aliases and help of a cog"""
+        return self.__manifest[cog]
+
+    def slash_commands(self) -> dict:
+        """returns the cog and definition of every slash command"""
+        return self.__slash
+
+    def diff(self, previous: list) -> tuple:
+        """returns the cogs removed and added since the previous list"""
+        current = self.get()
+        return [cog for cog in previous if cog not in self.__manifest], \
+               [cog for cog in current if cog not in previous]
 
 
 class App(commands.Bot):
     """The bot application"""
-    AVATAR_PATH = path.join(TOPDIR, 'img', 'avatar.png')
-    AVATAR_HASH = '0e2cba3d8bec4ff4db557700231b3c10'
+    ASSETS_PATH = path.join(TOPDIR, 'img')
+    AVATAR = 'avatar.png'
+    AVATAR_RETRIES = 5
+    DRAIN_TIMEOUT = 10  # seconds
 
     __settings: Settings
     __cogs: Cogs
     __activity: Activity
+    __mapped_library: bool
+    __lazy: dict
+    __avatar_checked: bool
+    __closing: bool
+    __running: set
+    __warm_state: dict
+    assets: StaticAssets
+    cog_load_times: dict
+    journal: RollJournal
     library: Library
+    rng: RandomStreams
+    watchdog: LoopWatchdog
+    throttle: Throttle
     version_number: str
     current_mode: str
 
-    def __init__(self, settings: Settings, cogs: Cogs, version: str = '1.0', **options):
+    def __init__(self, settings: Settings, cogs: Cogs, version: str = '1.0',
+                 mapped_library: bool = False, **options):
         super().__init__(**options)
         self.__settings = settings
         self.__cogs = cogs
         self.__activity = Activity(type=ActivityType.playing, name='vebot')
+        self.__mapped_library = mapped_library
+        self.__lazy = dict()
+        self.__avatar_checked = False
+        self.__closing = False
+        self.__running = set()
+        self.assets = StaticAssets(self.ASSETS_PATH, [self.AVATAR])
+        self.cog_load_times = dict()
         self.version_number = version
-        self.library = Library(settings)
+
+        # The state left by the previous process, the library it compiled
+        # is mapped for the first load
+        state = self.__read_state()
+        self.__warm_state = state.get('cogs', {})
+        self.library = Library(settings, mapped_library or 'library' in state)
+        self.rng = RandomStreams.restore(state['rng']) if 'rng' in state \
+            else RandomStreams()
+        self.journal = RollJournal(settings.JOURNAL_FILE)
+        self.watchdog = LoopWatchdog(settings.lag_threshold / 1000)
+        self.throttle = Throttle(settings)
+        self.add_check(self.__closing_check, call_once=True)
+        self.add_check(self.__throttle_check, call_once=True)
 
         # Try to load cogs
         try:
@@ -227,36 +439,297 @@ class App(commands.Bot):
 
     @property
     def app_avatar(self):
-        """Reads app avatar from disk"""
-        with open(self.AVATAR_PATH, 'rb') as handle:
-            return handle.read()
+        """Returns app avatar"""
+        return self.assets.get(self.AVATAR)
 
-    def reload_library(self):
-        """Reload library"""
-        self.library = Library(self.app_settings)
+    async def reload_library(self):
+        """Reload library, the books are loaded out of the event loop"""
+        self.library = await self.loop.run_in_executor(
+            None, Library, self.app_settings, self.__mapped_library)
 
     def reload_cogs(self):
-        """Reload cogs"""
+        """Loads and unloads the cogs that changed with the mode"""
+        previous = self.app_cogs.get()
         self.app_cogs.reload([self.app_settings.system, self.app_settings.mode])
-        for cog in self.app_cogs.get():
-            logging.info('loading %s', cog)
-            self.reload_extension(cog)
+        removed, added = self.app_cogs.diff(previous)
+        for cog in removed:
+            self.__unload_cog(cog)
+        for cog in added:
+            self.__register_cog(cog)
+        if self.app_settings.slash_commands == 'yes':
+            self.loop.create_task(self.register_slash_commands())
+
+    def load_cog(self, cog: str):
+        """Imports a lazily registered cog, replacing its command stubs"""
+        if cog not in self.__lazy:
+            return
+        for stub in self.__lazy.pop(cog):
+            self.remove_command(stub.name)
+        start = time.perf_counter()
+        self.load_extension(cog)
+        self.cog_load_times[cog] = time.perf_counter() - start
+        logging.info('%s loaded in %.1fms', cog, self.cog_load_times[cog] * 1000)
+
+    def __register_cog(self, cog: str):
+        """Registers command stubs that load the cog on first use"""
+        stubs = [commands.Command(self.__lazy_callback(cog), name=name, aliases=aliases,
+                                  **details)
+                 for name, aliases, details in self.app_cogs.commands(cog)]
+        self.__lazy[cog] = stubs
+        if not stubs:
+            self.load_cog(cog)
+            return
+        for stub in stubs:
+            stub.lazy = True
+            self.add_command(stub)
+        logging.info('registered %d commands for %s', len(stubs), cog)
+
+    def __unload_cog(self, cog: str):
+        """Unloads a cog or its command stubs"""
+        if cog in self.__lazy:
+            for stub in self.__lazy.pop(cog):
+                self.remove_command(stub.name)
+        elif cog in self.extensions:
+            logging.info('unloading %s', cog)
+            self.unload_extension(cog)
+        self.cog_load_times.pop(cog, None)
+
+    @staticmethod
+    def __lazy_callback(cog: str):
+        # pylint: disable=unused-argument
+        async def load_and_invoke(ctx, *, args: str = ""):
+            ctx.bot.load_cog(cog)
+            real_ctx = await ctx.bot.get_context(ctx.message)
+            if hasattr(ctx, 'replay_seed'):
+                real_ctx.replay_seed = ctx.replay_seed
+            await ctx.bot.invoke(real_ctx)
+        return load_and_invoke
+
+    async def start(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        """Starts the loop watchdog along with the bot"""
+        self.watchdog.start(self.loop)
+        await super().start(*args, **kwargs)
+
+    @property
+    def state_filename(self) -> str:
+        """File keeping the warm state between restarts, one per shard"""
+        return path.join(self.__settings.CACHE_PATH, f'state-{self.shard_id or 0}.json')
+
+    def __read_state(self) -> dict:
+        """Reads the state left by the previous process, only once"""
+        if not path.isfile(self.state_filename):
+            return dict()
+        try:
+            state = load_json_from_disk(self.state_filename)
+        except ValueError as err:
+            logging.error('warm state discarded: %s', err)
+            state = dict()
+        os.remove(self.state_filename)
+        logging.info('warm state restored from "%s"', self.state_filename)
+        return state
+
+    def warm_state(self, name: str) -> dict:
+        """Takes the saved state of a cog"""
+        return self.__warm_state.pop(name, {})
+
+    def save_state(self):
+        """Saves the state to resume after a restart"""
+        cogs = dict(self.__warm_state)  # cogs not loaded keep their state
+        for name, cog in self.cogs.items():
+            if hasattr(cog, 'save_state'):
+                cogs[name] = cog.save_state()
+        state = {"version": self.version_number, "rng": self.rng.state(), "cogs": cogs}
+
+        if self.__settings.library_backend == 'json':
+            filename = mapped_filename(self.__settings.CACHE_PATH, self.library.paths)
+            if is_stale(filename, self.library.paths):
+                compile_library(filename, self.library.paths, compile_book)
+            state["library"] = filename
+
+        os.makedirs(self.__settings.CACHE_PATH, exist_ok=True)
+        temporary = f'{self.state_filename}.{os.getpid()}'
+        with open(temporary, 'w') as handle:
+            json.dump(state, handle)
+        os.replace(temporary, self.state_filename)
+        logging.info('warm state saved to "%s"', self.state_filename)
+
+    async def shutdown(self):
+        """Stops taking commands, waits for the running ones and saves the state"""
+        if self.__closing:
+            return
+        self.__closing = True
+        logging.info('shutting down, %d commands running', len(self.__running))
+        try:
+            deadline = time.monotonic() + self.DRAIN_TIMEOUT
+            while self.__running and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            await self.loop.run_in_executor(None, self.save_state)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception('warm state not saved')
+        finally:
+            await self.close()
+
+    def run_gracefully(self, token: str):
+        """Runs the bot until a signal asks for a graceful shutdown"""
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            try:
+                self.loop.add_signal_handler(
+                    signum, lambda: self.loop.create_task(self.shutdown()))
+            except NotImplementedError:
+                pass
+        try:
+            self.loop.run_until_complete(self.start(token))
+        finally:
+            if not self.is_closed():
+                self.loop.run_until_complete(self.close())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    async def close(self):
+        """Writes the pending rolls to the journal when closing"""
+        await super().close()
+        self.journal.close()
+
+    async def on_message(self, message):
+        """Processes prefix commands unless disabled, only the owner keeps them"""
+        if message.author.bot:
+            return
+        if self.__settings.prefix_commands != 'yes' and \
+                not await self.is_owner(message.author):
+            return
+        await self.process_commands(message)
+
+    async def on_socket_response(self, msg):
+        """Picks the slash commands from the raw gateway events"""
+        if msg.get('t') != 'INTERACTION_CREATE' or \
+                self.__settings.slash_commands != 'yes':
+            return
+        data = msg['d']
+        if data.get('type') == APPLICATION_COMMAND:
+            await self.__interaction(InteractionContext(self, data))
+
+    async def register_slash_commands(self):
+        """Registers the slash commands, or clears them when disabled"""
+        definitions = dict()
+        if self.__settings.slash_commands == 'yes':
+            definitions = {name: definition for name, (_, definition)
+                           in self.__cogs.slash_commands().items()}
+        application = await self.application_info()
+        route = discord.http.Route('PUT', '/applications/{application_id}/commands',
+                                   application_id=application.id)
+        await self.http.request(route, json=registration(definitions))
+        logging.info('%d slash commands registered', len(definitions))
+
+    async def __interaction(self, ctx: InteractionContext):
+        """Runs a slash command through the checks of its prefix command"""
+        cog, definition = self.__cogs.slash_commands().get(ctx.invoked_with, (None, {}))
+        if not cog:
+            return
+        self.load_cog(cog)
+        ctx.command = self.get_command(ctx.invoked_with)
+        self.watchdog.command = f'/{ctx.invoked_with} {ctx.options}'
+        self.__running.add(id(ctx))
+        try:
+            if not await self.can_run(ctx, call_once=True) or \
+                    not await ctx.command.can_run(ctx):
+                raise commands.CheckFailure("You can't use this command here.")
+            # Slow commands answer later, before Discord drops the interaction
+            if definition.get('defer'):
+                await ctx.defer()
+            await ctx.command.callback(ctx.command.cog, ctx,
+                                       **bind(ctx.command.callback, definition,
+                                              ctx.options))
+        except commands.CommandError as err:
+            await self.on_command_error(ctx, err)
+            await self.__answer(ctx, str(err) or 'The command failed.')
+        except discord.HTTPException as err:
+            logging.error('slash command %s failed: %s', ctx.invoked_with, err)
+            await self.__answer(ctx, 'The command failed.')
+        finally:
+            self.__running.discard(id(ctx))
+
+    @staticmethod
+    async def __answer(ctx: InteractionContext, content: str):
+        """Answers an interaction left unanswered, or Discord shows it as failed"""
+        if ctx.answered and not ctx.deferred:
+            return
+        try:
+            await ctx.send(content, ephemeral=True)
+        except discord.HTTPException as err:
+            logging.error('slash command %s not answered: %s', ctx.invoked_with, err)
+
+    async def on_command(self, context):
+        """Tracks the running commands, the last one for the watchdog reports"""
+        self.__running.add(id(context))
+        self.watchdog.command = context.message.content
+
+    async def on_command_completion(self, context):
+        """Tracks the running commands"""
+        self.__running.discard(id(context))
 
     async def on_ready(self):
         """Handles the event triggered when bot is ready"""
         logging.info('Bot online as %s.', self.user)
         logging.info('avatar %s', self.user.avatar)
-        if not self.user.avatar or self.user.avatar != self.AVATAR_HASH:
-            logging.info('Changing avatar.')
-            await self.user.edit(avatar=self.app_avatar)
         await self.change_presence(activity=self.__activity)
 
-    async def on_message(self, message):
-        """General message handler"""
-        await self.process_commands(message)
+        # Reconnections trigger on_ready again, the avatar is checked only once
+        if self.__avatar_checked:
+            return
+        self.__avatar_checked = True
+        if self.__settings.slash_commands == 'yes' and not self.shard_id:
+            await self.register_slash_commands()
+        local_hash = self.assets.hash(self.AVATAR)
+        if not self.user.avatar or \
+                self.app_settings.avatar_hashes.get(local_hash) != self.user.avatar:
+            await self.edit_avatar()
+
+    async def edit_avatar(self) -> bool:
+        """Uploads the avatar, retrying with backoff"""
+        delay = 5
+        for _ in range(self.AVATAR_RETRIES):
+            try:
+                logging.info('Changing avatar.')
+                await self.user.edit(avatar=self.app_avatar)
+                hashes = {self.assets.hash(self.AVATAR): self.user.avatar}
+                self.app_settings.set('avatar_hashes', hashes)
+                return True
+            except discord.HTTPException as err:
+                # Client errors, like changing the avatar too fast, won't go away
+                if err.status < 500:
+                    logging.error('avatar change failed (%s)', err)
+                    return False
+                logging.warning('avatar change failed (%s), retrying in %ds', err, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+    async def __closing_check(self, ctx: commands.Context) -> bool:
+        """Global check rejecting new commands during the shutdown"""
+        if self.__closing:
+            raise ShuttingDown()
+        return True
+
+    async def __throttle_check(self, ctx: commands.Context) -> bool:
+        """Global check enforcing the command rates"""
+        if getattr(ctx.command, 'lazy', False) or await self.is_owner(ctx.author):
+            return True
+        wait = self.throttle.check(ctx)
+        if wait:
+            raise Throttled(wait)
+        return True
 
     async def on_command_error(self, context, exception):
         """Handle command errors"""
+        self.__running.discard(id(context))
+        if isinstance(exception, ShuttingDown):
+            await context.send(str(exception))
+            return
+        if isinstance(exception, Throttled):
+            if self.throttle.should_notify(context.author.id, exception.retry_after):
+                await context.send(f'{context.author.mention} {exception}')
+            return
+
         message = {
             BotMissingPermissions: lambda err: 'Missing Bot Permission: '
                                                f'{", ".join(err.missing_perms)}.',
@@ -275,10 +748,10 @@ class App(commands.Bot):
             logging.exception(exception, stack_info=True)
 
     def __load_cogs(self):
-        """Load all cogs into bot."""
+        """Register all cogs into bot, they are imported on first use."""
+        self.__cogs.reload([self.__settings.system, self.__settings.mode])
         for cog in self.__cogs.get():
-            logging.info('loading %s', cog)
-            self.load_extension(cog)
+            self.__register_cog(cog)
 
     @staticmethod
     @commands.command(name="set", aliases=['s'])
@@ -299,17 +772,29 @@ class App(commands.Bot):
         if not settings.set(setting, value, valid_values):
             if valid_values:
                 await ctx.send(f'invalid value, use [{", ".join(valid_values)}]')
+            else:
+                await ctx.send(f'invalid value "{value}"')
             return
 
-        # Reload library when needed
-        if setting in ['language', 'system', 'mode']:
-            ctx.bot.reload_library()
+        if setting == 'lag_threshold':
+            ctx.bot.watchdog.threshold = settings.lag_threshold / 1000
+
+        if setting == 'slash_commands':
+            await ctx.bot.register_slash_commands()
 
-        # Reload cogs when needed
+        # Reload library when needed, translations don't need it
+        library = ctx.bot.library
+        if setting in ['system', 'mode', 'library_backend'] or \
+                (setting == 'language' and library.paths != settings.library_paths):
+            await ctx.bot.reload_library()
+
+        # Reload cogs when needed, the notice is edited with the outcome
+        response = Response(ctx)
         if setting in ['system', 'mode']:
             try:
                 logging.info('%s triggered a cogs reload.', ctx.author)
-                await ctx.send(f'{ctx.message.author.mention} triggered a mode change.')
+                await response.progress(
+                    f'{ctx.message.author.mention} triggered a mode change.')
                 ctx.bot.reload_cogs()
             except (commands.ExtensionNotLoaded,
                     commands.ExtensionNotFound,
@@ -318,15 +803,39 @@ class App(commands.Bot):
                 # Inform User that reload was not successful
                 message_error = 'Error on reloading cogs.'
                 logging.error(message_error)
-                await ctx.send(message_error)
+                await response.add_line(message_error).send()
                 return
 
         message_success = f'{setting} changed to "{value}".'
         logging.info(message_success)
-        await ctx.send(message_success)
+        await response.add_line(message_success).send()
         return
 
 
+def setup_logging(loglevel: str, logfile: str, prefix: str = ''):
+    """Configures the logging"""
+    logging.basicConfig(filename=logfile, filemode='w', level=loglevel,
+                        format=f'%(levelname)s: {prefix}%(message)s')
+
+
+def run_app(settings: Settings, api: str = None, **options):
+    """Runs the bot until it's stopped"""
+    if api:
+        discord.http.Route.BASE = api
+    app = App(settings, Cogs(), command_prefix='.', version='0.1', **options)
+    logging.info('Starting bot')
+    app.run_gracefully(settings.token)
+
+
+def run_shard(shard_id: int, shard_count: int, loglevel: str, logfile: str, api: str):
+    """Runs a bot process for a shard sharing the compiled library"""
+    if logfile:
+        logfile = f'{logfile}.{shard_id}'
+    setup_logging(loglevel, logfile, f'[shard {shard_id}] ')
+    run_app(Settings(), api, mapped_library=True,
+            shard_id=shard_id, shard_count=shard_count)
+
+
 def main():
     """main"""
     args = docopt(__doc__, version="0.1")
@@ -336,8 +845,8 @@ def main():
     else:
         loglevel = args.pop('--log-level').upper()
 
-    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
-                        level=loglevel, format='%(levelname)s: %(message)s')
+    logfile = args.pop('--log-file')
+    setup_logging(loglevel, logfile)
 
     # Check python version
     is_min_python_3_6 = sys.version_info[0] == 3 and sys.version_info[1] >= 6
@@ -356,9 +865,15 @@ def main():
         sys.exit(1)
     settings.save()
 
-    app = App(settings, Cogs(), command_prefix='.', version='0.1')
-    logging.info('Starting bot')
-    app.run(settings.token)
+    shards = int(args.pop('--shards'))
+    api = args.pop('--api')
+    if shards > 1:
+        # Compile the library once so every shard just maps it
+        Library(settings, mapped=True)
+        Supervisor(run_shard, shards, (loglevel, logfile, api)).run()
+        return
+
+    run_app(settings, api)
 
 
 if __name__ == '__main__':
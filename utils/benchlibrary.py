@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+benchlibrary
+
+Tool to compare the library load time against the number of workers
+
+Usage:
+    benchlibrary [options] [PATH]
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --books=COUNT         Number of synthetic table books without PATH [default: 300]
+    --entries=COUNT       Number of entries per synthetic book [default: 100]
+    --runs=RUNS           Number of timed runs per worker count [default: 3]
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+from os import path
+from types import SimpleNamespace
+
+from docopt import docopt
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+from lib.books import Library, free_threaded  # noqa: E402
+
+
+def make_books(books_path: str, books: int, entries: int):
+    """Writes synthetic table books"""
+    for number in range(books):
+        pages = [{"Id": str(rid), "Details": f"Entry {rid} of table {number}",
+                  "Number": "1d6"} for rid in range(1, entries + 1)]
+        book = {"Id": f"bench{number:04}", "Title": f"Table {number}", "Type": 2,
+                "Die": f"1d{entries}", "Pages": pages}
+        with open(path.join(books_path, f'bench{number:04}.json'), 'w') as handle:
+            json.dump(book, handle)
+
+
+def worker_counts() -> list:
+    """Returns 1, 2, 4... up to the number of cores"""
+    counts = [1]
+    while counts[-1] * 2 < os.cpu_count():
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+
+def bench(books_path: str, runs: int):
+    """Times the library load for every worker count"""
+    print(f'{os.cpu_count()} cores, {"threads" if free_threaded() else "processes"}')
+    baseline = None
+    for jobs in worker_counts():
+        settings = SimpleNamespace(library_paths=[books_path], library_jobs=jobs,
+                                   library_backend='json', language='en')
+        elapsed = min(timeit.repeat(lambda: Library(settings), number=1, repeat=runs))
+        baseline = baseline or elapsed
+        print(f'{jobs:3} workers: {elapsed * 1000:8.1f} ms  x{baseline / elapsed:.2f}')
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    runs = int(args.pop('--runs'))
+    books_path = args.pop('PATH')
+    if books_path:
+        if not path.isdir(books_path):
+            logging.error('Path "%s" not found', books_path)
+            sys.exit(-1)
+        bench(books_path, runs)
+        return
+
+    with tempfile.TemporaryDirectory() as books_path:
+        make_books(books_path, int(args.pop('--books')), int(args.pop('--entries')))
+        bench(books_path, runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+benchtable
+
+Tool to compare batched table rolls against repeated single rolls
+
+Usage:
+    benchtable [options] FILENAME
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --count=COUNT         Number of rolls per run [default: 50]
+    --runs=RUNS           Number of timed runs [default: 20]
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import logging
+import sys
+import timeit
+from os import path
+
+from docopt import docopt
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+from lib.books import Table  # noqa: E402
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    filename = args.pop('FILENAME')
+    if not path.isfile(filename):
+        logging.error('File "%s" not found', filename)
+        sys.exit(-1)
+
+    table = Table(filename)
+    count = int(args.pop('--count'))
+    runs = int(args.pop('--runs'))
+
+    single = min(timeit.repeat(lambda: [table.roll() for _ in range(count)],
+                               number=1, repeat=runs))
+    batch = min(timeit.repeat(lambda: table.roll_many(count), number=1, repeat=runs))
+
+    print(f'{table.title}: {count} rolls, best of {runs}')
+    print(f'  single rolls: {single * 1000:.3f} ms')
+    print(f'  batched roll: {batch * 1000:.3f} ms ({single / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
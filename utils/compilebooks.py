@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+compilebooks
+
+Tool to validate the books against the schema of their type and compile them
+into a library the bot maps without parsing them again
+
+Usage:
+    compilebooks [options] [PATH...]
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    -o --output=FILE      Write the compiled library to this file
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Without PATH it checks the books directory and its subdirectories.
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import glob
+import json
+import logging
+import sys
+from os import path
+
+from docopt import docopt
+
+TOPDIR = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(TOPDIR, 'src'))
+
+from lib.books import compile_book, validate_book  # noqa: E402
+from lib.mapped import book_files, compile_library  # noqa: E402
+
+
+def validate(files: list) -> int:
+    """Prints the problems of every book, returns the number of broken books"""
+    broken = 0
+    for file in files:
+        try:
+            with open(file, 'r') as handle:
+                errors = validate_book(json.load(handle))
+        except (OSError, ValueError) as error:
+            errors = [f'not valid json: {error}']
+        if errors:
+            broken += 1
+            print(f'{file}:')
+            for error in errors:
+                print(f'  {error}')
+    return broken
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    books_path = path.join(TOPDIR, 'books')
+    library_paths = args.pop('PATH') or \
+        [books_path] + sorted(filter(path.isdir, glob.glob(path.join(books_path, '*_*'))))
+    files = book_files(library_paths)
+    broken = validate(files)
+    print(f'{len(files) - broken} of {len(files)} books are valid')
+
+    output = args.pop('--output')
+    if output and not broken:
+        compile_library(path.abspath(output), library_paths, compile_book)
+    sys.exit(1 if broken else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+footprint
+
+Tool to report the memory used by the books of a library
+
+Usage:
+    footprint [options] [PATH...]
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --top=COUNT           Number of books and fields listed [default: 10]
+    --compare             Measure with tracemalloc the library loaded with and
+                          without value interning
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Without PATH it loads the books directory and its subdirectories.
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import gc
+import glob
+import logging
+import sys
+import tracemalloc
+from os import path
+from types import SimpleNamespace
+
+from docopt import docopt
+
+TOPDIR = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(TOPDIR, 'src'))
+
+from lib.books import Library  # noqa: E402
+from lib.footprint import Footprint  # noqa: E402
+
+
+def traced_load(settings: SimpleNamespace) -> tuple:
+    """Loads a library under tracemalloc, returns it with the bytes it holds"""
+    gc.collect()
+    tracemalloc.start()
+    library = Library(settings)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return library, size
+
+
+def compare(library_paths: list):
+    """Prints the memory held by the library without and with interning"""
+    sizes = []
+    for intern_values in [False, True]:
+        settings = SimpleNamespace(library_paths=library_paths, library_backend='json',
+                                   language='en', intern_values=intern_values)
+        library, size = traced_load(settings)
+        sizes.append(size)
+        del library
+    plain, interned = sizes
+    print(f'without interning: {plain / 1024:10.1f} KiB')
+    print(f'with interning:    {interned / 1024:10.1f} KiB '
+          f'({100 * (plain - interned) / plain:.1f}% less)')
+    if interned >= plain:
+        sys.exit(1)
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    books_path = path.join(TOPDIR, 'books')
+    library_paths = args.pop('PATH') or \
+        [books_path] + sorted(filter(path.isdir, glob.glob(path.join(books_path, '*_*'))))
+    if args.pop('--compare'):
+        compare(library_paths)
+        return
+
+    settings = SimpleNamespace(library_paths=library_paths, library_backend='json',
+                               language='en')
+    footprint = Footprint(Library(settings))
+    print("\n".join(footprint.report(int(args.pop('--top')))))
+
+
+if __name__ == "__main__":
+    main()
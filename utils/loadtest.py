@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+loadtest
+
+Tool to load test the bot offline against a fake Discord gateway
+
+The fake gateway and HTTP API run in a separate process that replays the
+synthetic command messages and timestamps every reply, while the bot runs
+in this process so its event loop lag and memory can be measured.
+
+Usage:
+    loadtest [options] [COMMAND...]
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --rate=RATE           Command messages per second [default: 1000]
+    --duration=SECONDS    Seconds sending commands [default: 10]
+    --port=PORT           Port for the fake gateway [default: 0]
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import resource
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+from itertools import cycle
+from os import path
+
+from aiohttp import web, WSMsgType
+from docopt import docopt
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+import discord  # noqa: E402
+from vebot import App, Cogs, Settings  # noqa: E402
+
+COMMANDS = ['.roll 3d6', '.roll 4d6K3+2', '.odds 3d6', '.ping', '.rollt rumors',
+            '.rollt 1 10', '.encounter 1', '.monster ant']
+BOT = {"id": "1000", "username": "vebot", "discriminator": "0001",
+       "avatar": "loadtest", "bot": True}
+USER = {"id": "2000", "username": "player", "discriminator": "0002", "avatar": None}
+FIRST_CHANNEL = 10 ** 6
+
+
+def json_response(data: dict) -> web.Response:
+    """JSON response without charset, discord.py only parses application/json"""
+    return web.Response(body=json.dumps(data).encode('utf-8'),
+                        content_type='application/json')
+
+
+def percentiles(values: list) -> str:
+    """Formats the usual latency percentiles"""
+    if not values:
+        return "no samples"
+    values = sorted(values)
+    pick = [values[min(len(values) - 1, int(len(values) * pct))]
+            for pct in [0.5, 0.9, 0.99]]
+    return f'p50 {pick[0]:.1f}ms, p90 {pick[1]:.1f}ms, p99 {pick[2]:.1f}ms, ' \
+           f'max {values[-1]:.1f}ms'
+
+
+class FakeDiscord():
+    """Fake gateway and HTTP API replaying synthetic commands"""
+
+    def __init__(self, commands: list, rate: int, duration: float):
+        self.commands = commands
+        self.rate = rate
+        self.duration = duration
+        self.sequence = 0
+        self.sent = dict()
+        self.latencies = []
+        self.socket = None
+        self.done = asyncio.Event()
+
+    def message(self, channel_id: int, author: dict, content: str) -> dict:
+        """Message payload as Discord sends it"""
+        self.sequence += 1
+        return {"id": str(self.sequence), "channel_id": str(channel_id), "author": author,
+                "content": content, "timestamp": datetime.utcnow().isoformat(),
+                "edited_timestamp": None, "tts": False, "mention_everyone": False,
+                "mentions": [], "mention_roles": [], "attachments": [], "embeds": [],
+                "pinned": False, "type": 0}
+
+    async def dispatch(self, event: str, data: dict):
+        """Sends a gateway event"""
+        self.sequence += 1
+        await self.socket.send_str(json.dumps({"op": 0, "t": event, "s": self.sequence,
+                                               "d": data}))
+
+    async def gateway(self, request):
+        """Websocket gateway"""
+        self.socket = web.WebSocketResponse()
+        await self.socket.prepare(request)
+        await self.socket.send_str(json.dumps({"op": 10,
+                                               "d": {"heartbeat_interval": 41250}}))
+        async for msg in self.socket:
+            if msg.type != WSMsgType.TEXT:
+                break
+            payload = json.loads(msg.data)
+            if payload["op"] == 1:
+                await self.socket.send_str(json.dumps({"op": 11}))
+            elif payload["op"] == 2:
+                await self.dispatch("READY", {"v": 6, "user": BOT, "guilds": [],
+                                              "session_id": "loadtest",
+                                              "private_channels": [],
+                                              "relationships": []})
+        return self.socket
+
+    async def start(self, request):
+        """Starts replaying the commands once the bot is ready"""
+        asyncio.ensure_future(self.replay())
+        return json_response({})
+
+    async def replay(self):
+        """Sends the command messages at the configured rate"""
+        tick = 0.01
+        per_tick = max(1, int(self.rate * tick))
+        channel_id = FIRST_CHANNEL
+        commands = cycle(self.commands)
+        start = time.perf_counter()
+        while time.perf_counter() - start < self.duration:
+            for _ in range(per_tick):
+                channel_id += 1
+                self.sent[channel_id] = time.perf_counter()
+                await self.dispatch("MESSAGE_CREATE",
+                                    self.message(channel_id, USER, next(commands)))
+            await asyncio.sleep(tick)
+
+        # Give the last replies some time to arrive
+        for _ in range(100):
+            if not self.sent:
+                break
+            await asyncio.sleep(0.1)
+        self.done.set()
+
+    async def send_message(self, request):
+        """Receives a reply from the bot"""
+        channel_id = int(request.match_info['channel_id'])
+        sent = self.sent.pop(channel_id, None)
+        if sent:
+            self.latencies.append((time.perf_counter() - sent) * 1000)
+        if request.content_type == 'application/json':
+            data = await request.json()
+        else:
+            form = await request.post()
+            data = json.loads(form.get('payload_json', '{}'))
+        reply = self.message(channel_id, BOT, data.get('content') or "")
+        reply["embeds"] = [data["embed"]] if data.get("embed") else []
+        return json_response(reply)
+
+    async def application(self, request):
+        """Application info, the synthetic user owns the bot"""
+        return json_response({"id": BOT["id"], "name": "vebot", "description": "",
+                              "icon": None, "rpc_origins": None, "bot_public": False,
+                              "bot_require_code_grant": False, "owner": USER,
+                              "summary": "", "verify_key": ""})
+
+    async def other(self, request):
+        """Any other endpoint"""
+        if request.path.endswith('/gateway') or request.path.endswith('/gateway/bot'):
+            url = f'ws://{request.host}/ws'
+            return json_response({"url": url, "shards": 1})
+        if request.path.endswith('/users/@me'):
+            return json_response(BOT)
+        return json_response({})
+
+    def app(self) -> web.Application:
+        """aiohttp application"""
+        app = web.Application()
+        app.router.add_get('/ws', self.gateway)
+        app.router.add_post('/api/v7/loadtest/start', self.start)
+        app.router.add_post('/api/v7/channels/{channel_id}/messages', self.send_message)
+        app.router.add_get('/api/v7/oauth2/applications/@me', self.application)
+        app.router.add_route('*', '/{tail:.*}', self.other)
+        return app
+
+
+def serve(port: int, commands: list, rate: int, duration: float, results):
+    """Runs the fake Discord until the replay is done"""
+    async def run():
+        fake = FakeDiscord(commands, rate, duration)
+        runner = web.AppRunner(fake.app())
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        results.put('listening')
+        await fake.done.wait()
+        results.put({"sent": len(fake.latencies) + len(fake.sent),
+                     "unanswered": len(fake.sent), "latencies": fake.latencies})
+        await runner.cleanup()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+async def measure_lag(samples: list, interval: float = 0.05):
+    """Measures how late the event loop wakes up"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def drive(app: App, results) -> dict:
+    """Starts the replay once the bot is ready and waits for the results"""
+    await app.wait_until_ready()
+    lag = []
+    lag_task = asyncio.ensure_future(measure_lag(lag))
+    await app.http.request(discord.http.Route('POST', '/loadtest/start'))
+    start = time.perf_counter()
+    stats = await app.loop.run_in_executor(None, results.get)
+    stats["elapsed"] = time.perf_counter() - start
+    stats["lag"] = lag
+    lag_task.cancel()
+    await app.close()
+    return stats
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    port = int(args.pop('--port'))
+    if not port:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+    commands = args.pop('COMMAND') or COMMANDS
+    rate = int(args.pop('--rate'))
+    duration = float(args.pop('--duration'))
+
+    results = multiprocessing.get_context('spawn').Queue()
+    server = multiprocessing.get_context('spawn').Process(
+        target=serve, args=(port, commands, rate, duration, results))
+    server.start()
+    results.get()
+
+    discord.http.Route.BASE = f'http://127.0.0.1:{port}/api/v7'
+
+    # Settings, journal and warm state stay away from the working directory
+    with tempfile.TemporaryDirectory(prefix='vebot-loadtest-') as workdir:
+        Settings.SETTINGS_FILE = path.join(workdir, '.vebot.json')
+        Settings.CACHE_PATH = path.join(workdir, '.vebot-cache')
+        Settings.JOURNAL_FILE = path.join(workdir, '.vebot-journal.sqlite')
+        settings = Settings()
+        settings.token = 'loadtest'
+        app = App(settings, Cogs(), command_prefix='.', version='loadtest')
+        settings.avatar_hashes = {app.assets.hash(App.AVATAR): BOT["avatar"]}
+        task = app.loop.create_task(app.start(settings.token))
+        stats = app.loop.run_until_complete(drive(app, results))
+        task.cancel()
+        server.join()
+
+    replies = len(stats["latencies"])
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'commands sent:  {stats["sent"]} ({stats["unanswered"]} unanswered)')
+    print(f'throughput:     {replies / stats["elapsed"]:.0f} replies/s')
+    print(f'latency:        {percentiles(stats["latencies"])}')
+    print(f'event loop lag: {percentiles(stats["lag"])}')
+    print(f'max rss:        {maxrss:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
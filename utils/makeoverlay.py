@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+makeoverlay
+
+Tool to turn a translated book into an overlay of the base book, keeping only
+the fields that differ. Overlays go to books/overlays/LANGUAGE/.
+
+Usage:
+    makeoverlay [options] BASE TRANSLATED OUTPUT
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import json
+import logging
+import sys
+from os import path
+
+from docopt import docopt
+
+
+def diff_pages(base: list, translated: list) -> list:
+    """Returns the translated fields of the pages, matching them by Id"""
+    pages = dict()
+    for page in base:
+        pages.setdefault(page["Id"], []).append(page)
+
+    result = []
+    for page in translated:
+        candidates = pages.get(page["Id"])
+        if not candidates:
+            logging.warning('page "%s" is not in the base book', page["Id"])
+            continue
+        original = candidates.pop(0)
+        fields = dict()
+        for key, value in page.items():
+            if key == "Id" or original.get(key) == value:
+                continue
+            if isinstance(value, dict) and isinstance(original.get(key), dict):
+                # Nested tables keep only their own translated fields
+                value = make_overlay(original[key], value)
+                if not value["Pages"] and "Title" not in value:
+                    continue
+            fields[key] = value
+        if fields:
+            result.append({"Id": page["Id"], **fields})
+    return result
+
+
+def make_overlay(base: dict, translated: dict) -> dict:
+    """Returns the overlay turning the base book into the translated one"""
+    overlay = {"Id": base["Id"]}
+    if translated["Title"] != base["Title"]:
+        overlay["Title"] = translated["Title"]
+    overlay["Pages"] = diff_pages(base["Pages"], translated["Pages"])
+    return overlay
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    books = []
+    for filename in [args.pop('BASE'), args.pop('TRANSLATED')]:
+        if not path.isfile(filename):
+            logging.error('File "%s" not found', filename)
+            sys.exit(-1)
+        with open(filename, 'r') as handle:
+            books.append(json.load(handle))
+
+    overlay = make_overlay(*books)
+    with open(args.pop('OUTPUT'), 'w') as handle:
+        json.dump(overlay, handle, indent=2, ensure_ascii=False)
+    print(f'{len(overlay["Pages"])} of {len(books[1]["Pages"])} pages translated')
+
+
+if __name__ == "__main__":
+    main()
@@ -29,12 +29,21 @@ maketable
 
 Tool to create random tables in json
 
+Every line of the input is an entry of the table. Entries may start with
+their Id ("3-6. Details"), otherwise they are numbered sequentially, and
+may end with the dice for the number appearing ("# wolf$ | 2d6"). Lines
+indented below an entry make up a chained table for it. Headers like
+"#Die: 1d6", "#Title: ...", "#Id: ...", "#rop: concat" or "#forced_roll: 3"
+at the beginning of a table set its attributes.
+
 Usage:
-    maketable [options] FILENAME
+    maketable [options] FILENAME...
 
 Options:
     -h --help             Show this message
     --version             Show version
+    -o --output=DIR       Write the tables as json files into a books directory
+    -j --jobs=JOBS        Number of files converted in parallel [default: 4]
     --log-level=LEVEL     Level of logging to produce [default: INFO]
     --log-file=PATH       Specify a file to write the log
     -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
@@ -43,23 +52,169 @@ Log levels:  DEBUG INFO WARNING ERROR CRITICAL
 
 """
 
+import glob
 import json
 import logging
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from os import path
 
 from docopt import docopt
 
-
-def load_file_from_disk(filename):
-    """Loads a file from disk"""
-    with open(filename, "r") as handle:
-        return handle.readlines()
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+from lib.odds import OddsError, distribution  # noqa: E402
+
+HEADER = re.compile(r'^#\s*(Id|Title|Die|rop|forced_roll)\s*:\s*(.*)$')
+ENTRY_ID = re.compile(r'^(\d+)(?:-(\d+))?\.\s+(.*)$')
+
+
+class TableBuilder():
+    """Builds a table from the lines indented at the same level"""
+
+    def __init__(self, bid: str, title: str, indent: int = 0):
+        self.book = {"Id": bid, "Title": title, "Type": 2, "Pages": []}
+        self.indent = indent
+        self.next_id = 1
+        self.last = None
+
+    def header(self, key: str, value: str):
+        """Sets a table attribute"""
+        self.book[key] = int(value) if key == 'forced_roll' else value
+
+    def entry(self, text: str):
+        """Adds an entry to the table"""
+        match = ENTRY_ID.match(text)
+        if match:
+            low, high, text = match.groups()
+            eid = f'{low}-{high}' if high else low
+            self.next_id = int(high or low) + 1
+        else:
+            eid = str(self.next_id)
+            self.next_id += 1
+
+        entry = {"Id": eid, "Details": text}
+        if '|' in text:
+            details, number = text.rsplit('|', 1)
+            entry = {"Id": eid, "Details": details.strip(), "Number": number.strip()}
+        self.book["Pages"].append(entry)
+        self.last = entry
+
+    def finish(self) -> dict:
+        """Returns the table json with the keys in the usual order"""
+        book = self.book
+        if "Die" not in book:
+            top = max([1] + [page_range(page)[1] for page in book["Pages"]])
+            book["Die"] = f'1d{top}'
+        keys = ["Id", "Title", "Type", "Die", "rop", "forced_roll", "Pages"]
+        return {key: book[key] for key in keys if key in book}
+
+
+def page_range(page: dict) -> tuple:
+    """Returns the lowest and highest values of an entry Id"""
+    values = page["Id"].split("-")
+    return int(values[0]), int(values[-1])
+
+
+def parse(lines, bid: str) -> dict:
+    """Parses the lines of a table, streaming them one by one"""
+    stack = [TableBuilder(bid, bid)]
+    first = True
+    for (number, line) in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        text = line.rstrip('\r\n').lstrip()
+        indent = len(line) - len(line.lstrip())
+        if first:
+            stack[0].indent = indent
+            first = False
+
+        while indent < stack[-1].indent:
+            finished = stack.pop()
+            stack[-1].last["Table"] = finished.finish()
+        if indent > stack[-1].indent:
+            parent = stack[-1]
+            if not parent.last or "Table" in parent.last:
+                raise ValueError(f'line {number}: unexpected indentation')
+            sid = f'{parent.book["Id"]}.{parent.last["Id"]}'
+            stack.append(TableBuilder(sid, f'{parent.book["Title"]} {parent.last["Id"]}',
+                                      indent))
+
+        header = HEADER.match(text)
+        if header and not stack[-1].book["Pages"]:
+            stack[-1].header(*header.groups())
+        else:
+            stack[-1].entry(text)
+
+    while len(stack) > 1:
+        finished = stack.pop()
+        stack[-1].last["Table"] = finished.finish()
+    return stack[0].finish()
+
+
+def validate(book: dict) -> list:
+    """Checks that every roll of the die has an entry and every entry a roll"""
+    errors = []
+    pages = book["Pages"]
+    covered = set()
+    for page in pages:
+        low, high = page_range(page)
+        covered.update(range(low, high + 1))
+        if "Table" in page:
+            errors += validate(page["Table"])
+    if "forced_roll" in book:
+        return errors
+
+    try:
+        dist = distribution(book["Die"])
+    except OddsError as err:
+        return errors + [f'table {book["Id"]}: die "{book["Die"]}" {err}']
+
+    rolls = {value for value, prob in dist.outcomes() if prob > 0.0}
+    gaps = sorted(rolls - covered)
+    if gaps:
+        errors.append(f'table {book["Id"]}: no entries for {gaps}')
+    for page in pages:
+        low, high = page_range(page)
+        if not rolls.intersection(range(low, high + 1)):
+            errors.append(f'table {book["Id"]}: entry {page["Id"]} can not be rolled')
+    return errors
+
+
+def convert(filename: str, output: str = None) -> tuple:
+    """Converts a text file into a table, writing it when an output is set"""
+    bid = path.splitext(path.basename(filename))[0]
+    try:
+        with open(filename, "r") as handle:
+            book = parse(handle, bid)
+    except ValueError as err:
+        return filename, None, [f'{filename}: {err}']
+
+    errors = [f'{filename}: {error}' for error in validate(book)]
+    if output and not errors:
+        with open(path.join(output, f'{bid}.json'), "w") as handle:
+            json.dump(book, handle, indent=2, ensure_ascii=False)
+    return filename, book, errors
+
+
+def expand(filenames: list) -> list:
+    """Expands directories into the text files they contain"""
+    result = []
+    for filename in filenames:
+        if path.isdir(filename):
+            result += sorted(glob.glob(path.join(filename, '*.txt')))
+        elif path.isfile(filename):
+            result += [filename]
+        else:
+            logging.error('File "%s" not found', filename)
+            sys.exit(-1)
+    return result
 
 
 def main():
     """main"""
-    args = docopt(__doc__, version="0.1")
+    args = docopt(__doc__, version="0.2")
 
     if args.pop('--verbose'):
         loglevel = 'DEBUG'
@@ -69,22 +224,27 @@ def main():
     logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
                         level=loglevel, format='%(levelname)s: %(message)s')
 
-    filename = args.pop('FILENAME')
-    if not path.isfile(filename):
-        logging.error('File "%s" not found', filename)
+    filenames = expand(args.pop('FILENAME'))
+    output = args.pop('--output')
+    if output and not path.isdir(output):
+        logging.error('Books directory "%s" not found', output)
         sys.exit(-1)
 
-    lines = load_file_from_disk(filename)
-    count = len(lines)
-    entries = []
-    for (eid, line) in enumerate(lines, 1):
-        line = line.strip()
-        entries += [{"Id": str(eid), "Details": line}]
-
-    table = {"Id": "undefined", "Title": "undefined title", "Type": 2,
-             "Die": f"1d{count}", "Pages": entries}
-
-    print(json.dumps(table, indent=2, ensure_ascii=False))
+    status = 0
+    outputs = [output] * len(filenames)
+    with ProcessPoolExecutor(max_workers=int(args.pop('--jobs'))) as executor:
+        for (filename, book, errors) in executor.map(convert, filenames, outputs):
+            for error in errors:
+                logging.error(error)
+                status = -1
+            if not book or errors:
+                continue
+            if output:
+                logging.info('"%s" written as table "%s"', filename, book["Id"])
+            else:
+                print(json.dumps(book, indent=2, ensure_ascii=False))
+
+    sys.exit(status)
 
 
 if __name__ == '__main__':
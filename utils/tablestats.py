@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Josep Torra
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# pylint: skip-file
+
+"""
+tablestats
+
+Tool to compute how often each entry of a random table comes up
+
+Usage:
+    tablestats [options] FILENAME...
+
+Options:
+    -h --help             Show this message
+    --version             Show version
+    --simulate=COUNT      Also simulate COUNT rolls [default: 0]
+    --log-level=LEVEL     Level of logging to produce [default: WARNING]
+    --log-file=PATH       Specify a file to write the log
+    -v --verbose          Verbose logging (equivalent to --log-level=DEBUG)
+
+Log levels:  DEBUG INFO WARNING ERROR CRITICAL
+
+"""
+
+import logging
+import sys
+from os import path
+
+from docopt import docopt
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+from lib.books import Table  # noqa: E402
+from lib.tablestats import TableStats  # noqa: E402
+
+
+def main():
+    """main"""
+    args = docopt(__doc__, version="0.1")
+
+    if args.pop('--verbose'):
+        loglevel = 'DEBUG'
+    else:
+        loglevel = args.pop('--log-level').upper()
+
+    logging.basicConfig(filename=args.pop('--log-file'), filemode='w',
+                        level=loglevel, format='%(levelname)s: %(message)s')
+
+    count = int(args.pop('--simulate'))
+    status = 0
+    for filename in args.pop('FILENAME'):
+        if not path.isfile(filename):
+            logging.error('File "%s" not found', filename)
+            sys.exit(-1)
+
+        table = Table(filename)
+        stats = TableStats(table).exact()
+        if count:
+            stats.simulate(count)
+
+        print(f'{table.title} [{table.bid}] {table.Die}')
+        print("\n".join(stats.report(count, width=70)))
+        for unreachable in stats.unreachable:
+            logging.warning('%s: entry %s can not be rolled', filename, unreachable.path)
+            status = 1
+        print()
+
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()